@@ -0,0 +1,58 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+
+from app.services.agent_service import AgentService
+from app.services.dataset_service import DatasetService, DatasetSnapshot
+from app.services.registry import ServiceRegistry
+from app.services.reliability_store import ReliabilityStore
+from app.services.search_filters import resolve_category
+
+# Segundos sugeridos ao cliente (Retry-After) enquanto o serviço aquece
+RETRY_AFTER_SECONDS = 5
+
+
+def get_registry(request: Request) -> ServiceRegistry:
+    return request.app.state.services
+
+
+def _require(registry: ServiceRegistry, step: str, message: str) -> None:
+    """503 imediato enquanto a etapa de aquecimento não terminou."""
+    if registry.warmup.ready(step):
+        return
+    error = registry.warmup.error(step)
+    detail = f"{message} (última falha: {error})" if error else message
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+def get_dataset(registry: ServiceRegistry = Depends(get_registry)) -> DatasetService:
+    _require(registry, "dataset", "Planilha ainda em carregamento; tente novamente em instantes")
+    return registry.dataset
+
+
+def get_reliability_store(registry: ServiceRegistry = Depends(get_registry)) -> ReliabilityStore:
+    return registry.reliability
+
+
+def get_agent_service(registry: ServiceRegistry = Depends(get_registry)) -> AgentService:
+    return registry.agent
+
+
+def get_ready_agent_service(registry: ServiceRegistry = Depends(get_registry)) -> AgentService:
+    _require(registry, "index", "Busca ainda em preparação (modelo e índice); tente novamente em instantes")
+    return registry.agent
+
+
+def category_param(value: Optional[str], column: str, snapshot: DatasetSnapshot) -> Optional[str]:
+    """Filtro de local/prioridade da requisição -> categoria existente; 422
+    quando o valor não corresponde a nenhuma."""
+    if not value:
+        return None
+    try:
+        return resolve_category(value, column, snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
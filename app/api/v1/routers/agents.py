@@ -1,23 +1,143 @@
-from fastapi import APIRouter, Body, status
-from app.services.agent_service import AgentService
+import json
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.api.v1.dependencies import category_param, get_agent_service, get_ready_agent_service
+from app.services.agent_service import MAX_RETRIEVAL_K, AgentService
+from app.services.search_filters import SearchFilters, resolve_subsystems
 from app.utils.logger_config import setup_logger
 
 router = APIRouter(prefix="/agents", tags=["Agents"])
-service = AgentService()
 logger = setup_logger(__name__)
 
+MAX_BATCH_QUESTIONS = 100
+
+
+class Filtros(BaseModel):
+    subsistema: Optional[str] = None
+    local: Optional[str] = None
+    prioridade: Optional[str] = None
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+
+
+def _search_filters(filtros: Optional[Filtros], service: AgentService) -> Optional[SearchFilters]:
+    if filtros is None:
+        return None
+    snapshot = service.dataset.snapshot()
+    subsistemas = None
+    if filtros.subsistema:
+        subsistemas = resolve_subsystems(filtros.subsistema, snapshot)
+    return SearchFilters(
+        subsistemas=subsistemas,
+        local=category_param(filtros.local, "local", snapshot),
+        prioridade=category_param(filtros.prioridade, "prioridade", snapshot),
+        data_inicio=filtros.data_inicio,
+        data_fim=filtros.data_fim,
+    )
+
+
 @router.post(
     "/echo",
     status_code=status.HTTP_200_OK,
-    summary="Echo de string",
-    description="Recebe uma string e retorna a mesma string."
+    summary="Pergunta ao agente",
+    description=(
+        "Recebe uma pergunta e retorna a resposta do agente com as linhas usadas como contexto. "
+        "`k` (opcional) define quantas linhas são recuperadas e `filtros` (opcional) restringe "
+        "a busca por subsistema, local, prioridade e período de dt_falha."
+    )
 )
-def echo(text: str = Body(..., embed=True)):
+async def echo(
+    text: str = Body(..., embed=True),
+    k: Optional[int] = Body(None, ge=1, le=MAX_RETRIEVAL_K),
+    filtros: Optional[Filtros] = Body(None),
+    service: AgentService = Depends(get_ready_agent_service),
+):
     logger.info(f"Received echo request with text length: {len(text)}")
     try:
-        result = service.echo(text)
+        result = await service.aecho(text, k, _search_filters(filtros, service))
         logger.info("Echo request processed successfully")
-        return {"text": result}
+        return result
     except Exception as e:
         logger.error(f"Error in echo: {e}")
         return {"error": str(e)}
+
+
+@router.post(
+    "/echo/stream",
+    status_code=status.HTTP_200_OK,
+    summary="Pergunta ao agente (streaming)",
+    description=(
+        "Mesma pergunta de /agents/echo, respondida via Server-Sent Events: eventos `token` "
+        "com trechos da resposta e um evento final `done` com as fontes e os tempos."
+    ),
+)
+async def echo_stream(
+    text: str = Body(..., embed=True),
+    k: Optional[int] = Body(None, ge=1, le=MAX_RETRIEVAL_K),
+    filtros: Optional[Filtros] = Body(None),
+    service: AgentService = Depends(get_ready_agent_service),
+):
+    logger.info(f"Received streaming request with text length: {len(text)}")
+    filters = _search_filters(filtros, service)
+
+    async def events():
+        async for event, data in service.astream(text, k, filters):
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/batch",
+    status_code=status.HTTP_200_OK,
+    summary="Várias perguntas ao agente",
+    description=(
+        "Recebe uma lista de perguntas e responde todas de uma vez: um único lote de embeddings, "
+        "buscas agrupadas e chamadas ao Gemini em paralelo. Cada item de `results` traz a "
+        "resposta (ou `error`) e seu tempo; `k` e `filtros` valem para todas as perguntas."
+    ),
+)
+async def batch(
+    questions: List[str] = Body(..., embed=True, min_length=1, max_length=MAX_BATCH_QUESTIONS),
+    k: Optional[int] = Body(None, ge=1, le=MAX_RETRIEVAL_K),
+    filtros: Optional[Filtros] = Body(None),
+    service: AgentService = Depends(get_ready_agent_service),
+):
+    logger.info(f"Received batch request with {len(questions)} questions")
+    try:
+        return await service.abatch(questions, k, _search_filters(filtros, service))
+    except Exception as e:
+        logger.error(f"Error in batch: {e}")
+        return {"error": str(e)}
+
+
+@router.get(
+    "/cache",
+    status_code=status.HTTP_200_OK,
+    summary="Estatísticas do cache de respostas",
+    description="Retorna entradas, acertos (exatos e semânticos), erros e invalidações do cache de respostas."
+)
+def cache_stats(service: AgentService = Depends(get_agent_service)):
+    return service.cache.stats()
+
+
+@router.post(
+    "/reindex",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Atualiza o índice vetorial",
+    description="Agenda em segundo plano a sincronização incremental do Chroma com a planilha atual."
+)
+def reindex(
+    background_tasks: BackgroundTasks,
+    service: AgentService = Depends(get_ready_agent_service),
+):
+    background_tasks.add_task(service.sync_index)
+    return {"status": "agendado"}
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Depends, Response, status
+from app.api.v1.dependencies import get_registry
+from app.services.registry import ServiceRegistry
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get(
+    "/live",
+    status_code=status.HTTP_200_OK,
+    summary="Liveness",
+    description="Responde enquanto o processo está no ar, sem depender da planilha, do modelo ou do índice.",
+)
+def live():
+    return {"status": "ok"}
+
+
+@router.get(
+    "/ready",
+    status_code=status.HTTP_200_OK,
+    summary="Readiness",
+    description=(
+        "200 quando a planilha está carregada e `/metrics` pode responder; 503 antes disso. "
+        "`agents` indica se a busca (modelo de embeddings e índice) já está pronta para `/agents`, "
+        "e `etapas` traz o estado de cada etapa do aquecimento."
+    ),
+)
+def ready(response: Response, registry: ServiceRegistry = Depends(get_registry)):
+    warmup = registry.warmup
+    dataset_ready = warmup.ready("dataset")
+    if not dataset_ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "pronto" if dataset_ready else "iniciando",
+        "agents": warmup.ready("index"),
+        "etapas": warmup.status(),
+    }
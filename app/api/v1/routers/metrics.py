@@ -1,41 +1,92 @@
-from fastapi import APIRouter, status
-from app.services.agent_service import AgentService
+from datetime import date
+from typing import Literal, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, Query, status
+from app.api.v1.dependencies import category_param, get_dataset, get_reliability_store
+from app.services.aggregates import PATTERNS, get_aggregates, subsystems_matching, top_for_rows
+from app.services.dataset_service import DatasetService
+from app.services.reliability_engine import REQUIRED_COLUMNS, ReliabilityReport, get_reliability
+from app.services.reliability_store import MAX_ULTIMOS_DIAS, ReliabilityStore, window_filters
+from app.services.search_filters import SearchFilters, resolve_subsystems, scope_mask
 from app.utils.logger_config import setup_logger
-import pandas as pd
 
 router = APIRouter(prefix="/metrics", tags=["Metrics"])
-service = AgentService()
 logger = setup_logger(__name__)
 
 
+GroupBy = Literal["subsistema", "local", "prioridade"]
+
+
+def _filters(
+    data_inicio: Optional[date] = Query(None, description="Primeiro dia (dt_falha) da janela"),
+    data_fim: Optional[date] = Query(None, description="Último dia (dt_falha) da janela"),
+    ultimos_dias: Optional[int] = Query(
+        None, ge=1, le=MAX_ULTIMOS_DIAS, description="Janela dos últimos N dias até data_fim (ou hoje)"
+    ),
+    subsistema: Optional[str] = Query(None, description="Sigla ou parte dela"),
+    local: Optional[str] = None,
+    prioridade: Optional[str] = None,
+    dataset: DatasetService = Depends(get_dataset),
+) -> SearchFilters:
+    snapshot = dataset.snapshot()
+    return window_filters(
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+        ultimos_dias=ultimos_dias,
+        subsistemas=resolve_subsystems(subsistema, snapshot) if subsistema else None,
+        local=category_param(local, "local", snapshot),
+        prioridade=category_param(prioridade, "prioridade", snapshot),
+    )
+
+
+def _report(
+    dataset: DatasetService, store: ReliabilityStore, filters: SearchFilters, agrupar_por: str
+) -> Optional[ReliabilityReport]:
+    snapshot = dataset.snapshot()
+    if not REQUIRED_COLUMNS.issubset(snapshot.df.columns):
+        return None
+    if filters.empty and agrupar_por == "subsistema":
+        return get_reliability(snapshot)
+    # Janelas e recortes: combinação das partições mensais
+    return store.report(snapshot, filters, group_by=agrupar_por)
+
+
+def _reliability_table(
+    dataset: DatasetService,
+    store: ReliabilityStore,
+    filters: SearchFilters,
+    agrupar_por: str,
+    column: str,
+    ascending: bool,
+):
+    report = _report(dataset, store, filters, agrupar_por)
+    if report is None:
+        return None
+    table = report.table[[column]].dropna()
+    table = table.sort_values(by=column, ascending=ascending).round(2)
+    return table.reset_index().to_dict(orient="records")
+
+
 @router.get(
     "/mttf",
     status_code=status.HTTP_200_OK,
     summary="MTTF por subsistema (dias)",
-    description="Calcula o Mean Time To Failure (MTTF) agrupado por subsistema."
+    description=(
+        "Calcula o Mean Time To Failure (MTTF) agrupado por subsistema (ou local/prioridade), "
+        "opcionalmente numa janela de datas e recorte de subsistema, local e prioridade."
+    )
 )
-def get_mttf():
+def get_mttf(
+    agrupar_por: GroupBy = "subsistema",
+    filters: SearchFilters = Depends(_filters),
+    dataset: DatasetService = Depends(get_dataset),
+    store: ReliabilityStore = Depends(get_reliability_store),
+):
     try:
-        df = service._load_and_clean_df()
-        if "subsistema" not in df.columns or "dt_falha" not in df.columns:
+        results = _reliability_table(dataset, store, filters, agrupar_por, "mttf_dias", ascending=False)
+        if results is None:
             return {"error": "Colunas necessárias não encontradas na planilha."}
-
-        df = df.sort_values(by=["subsistema", "dt_falha", "hr_falha"])
-        results = []
-
-        for subsistema, group in df.groupby("subsistema"):
-            group = group.dropna(subset=["dt_falha"])
-            if len(group) < 2:
-                continue
-
-            diffs = group["dt_falha"].diff().dt.total_seconds() / (3600 * 24)
-            mttf = diffs.mean(skipna=True)
-            results.append({
-                "subsistema": subsistema,
-                "mttf_dias": round(mttf, 2) if pd.notnull(mttf) else None
-            })
-
-        results = sorted(results, key=lambda x: x["mttf_dias"] or 0, reverse=True)
         return results
 
     except Exception as e:
@@ -47,31 +98,21 @@ def get_mttf():
     "/mttr",
     status_code=status.HTTP_200_OK,
     summary="MTTR por subsistema (horas)",
-    description="Calcula o Mean Time To Repair (MTTR) agrupado por subsistema."
+    description=(
+        "Calcula o Mean Time To Repair (MTTR) agrupado por subsistema (ou local/prioridade), "
+        "opcionalmente numa janela de datas e recorte de subsistema, local e prioridade."
+    )
 )
-def get_mttr():
+def get_mttr(
+    agrupar_por: GroupBy = "subsistema",
+    filters: SearchFilters = Depends(_filters),
+    dataset: DatasetService = Depends(get_dataset),
+    store: ReliabilityStore = Depends(get_reliability_store),
+):
     try:
-        df = service._load_and_clean_df()
-        if not {"subsistema", "dt_falha", "hr_falha", "dt_enc", "hr_enc"}.issubset(df.columns):
+        results = _reliability_table(dataset, store, filters, agrupar_por, "mttr_horas", ascending=True)
+        if results is None:
             return {"error": "Colunas necessárias não encontradas na planilha."}
-
-        results = []
-        for subsistema, group in df.groupby("subsistema"):
-            group = group.dropna(subset=["dt_falha", "dt_enc"])
-            if len(group) == 0:
-                continue
-
-            start = pd.to_datetime(group["dt_falha"].astype(str) + " " + group["hr_falha"].astype(str), errors="coerce")
-            end = pd.to_datetime(group["dt_enc"].astype(str) + " " + group["hr_enc"].astype(str), errors="coerce")
-            diffs = (end - start).dt.total_seconds() / 3600  # horas
-            mttr = diffs.mean(skipna=True)
-
-            results.append({
-                "subsistema": subsistema,
-                "mttr_horas": round(mttr, 2) if pd.notnull(mttr) else None
-            })
-
-        results = sorted(results, key=lambda x: x["mttr_horas"] or 0)
         return results
 
     except Exception as e:
@@ -83,29 +124,22 @@ def get_mttr():
     "/disponibilidade",
     status_code=status.HTTP_200_OK,
     summary="Disponibilidade por subsistema (%)",
-    description="Calcula a disponibilidade percentual (MTTF / (MTTF + MTTR))."
+    description=(
+        "Calcula a disponibilidade percentual (MTTF / (MTTF + MTTR)), com os mesmos "
+        "filtros e agrupamentos de /metrics/mttf."
+    )
 )
-def get_disponibilidade():
+def get_disponibilidade(
+    agrupar_por: GroupBy = "subsistema",
+    filters: SearchFilters = Depends(_filters),
+    dataset: DatasetService = Depends(get_dataset),
+    store: ReliabilityStore = Depends(get_reliability_store),
+):
     try:
-        df = service._load_and_clean_df()
-        if not {"subsistema", "dt_falha", "hr_falha", "dt_enc", "hr_enc"}.issubset(df.columns):
+        results = _reliability_table(dataset, store, filters, agrupar_por, "disponibilidade", ascending=False)
+        if results is None:
             return {"error": "Colunas necessárias não encontradas na planilha."}
-
-        # --- Reutiliza os cálculos de MTTF e MTTR ---
-        mttf_df = pd.DataFrame(get_mttf())
-        mttr_df = pd.DataFrame(get_mttr())
-
-        merged = pd.merge(mttf_df, mttr_df, on="subsistema", how="inner")
-        merged["disponibilidade"] = (
-            merged["mttf_dias"] * 24 / (merged["mttf_dias"] * 24 + merged["mttr_horas"])
-        ) * 100
-
-        merged = merged[["subsistema", "disponibilidade"]].sort_values(
-            by="disponibilidade", ascending=False
-        )
-        merged["disponibilidade"] = merged["disponibilidade"].round(2)
-
-        return merged.to_dict(orient="records")
+        return results
 
     except Exception as e:
         logger.error(f"Erro ao calcular disponibilidade: {e}")
@@ -116,20 +150,34 @@ def get_disponibilidade():
     "/falhas",
     status_code=status.HTTP_200_OK,
     summary="Subsistemas que mais falham",
-    description="Conta o número de falhas registradas por subsistema e retorna em ordem decrescente."
+    description=(
+        "Conta o número de falhas registradas por subsistema (ou local/prioridade) e retorna "
+        "em ordem decrescente, com os mesmos filtros de /metrics/mttf."
+    )
 )
-def get_falhas_por_subsistema():
+def get_falhas_por_subsistema(
+    agrupar_por: GroupBy = "subsistema",
+    filters: SearchFilters = Depends(_filters),
+    dataset: DatasetService = Depends(get_dataset),
+):
     try:
-        df = service._load_and_clean_df()
-        if "subsistema" not in df.columns:
-            return {"error": "Coluna 'subsistema' não encontrada na planilha."}
-
-        counts = df["subsistema"].value_counts().reset_index()
-        counts.columns = ["subsistema", "quantidade_falhas"]
-        counts = counts.sort_values(by="quantidade_falhas", ascending=False)
-
-        logger.info(f"Falhas por subsistema calculadas para {len(counts)} registros.")
-        return counts.to_dict(orient="records")
+        snapshot = dataset.snapshot()
+        if agrupar_por not in snapshot.df.columns:
+            return {"error": f"Coluna '{agrupar_por}' não encontrada na planilha."}
+
+        # Contagem simples: ranking pré-calculado ou as linhas do recorte,
+        # sem depender das colunas de data/hora do cálculo de confiabilidade
+        aggregates = get_aggregates(snapshot)
+        keep = scope_mask(snapshot, filters)
+        if keep is None and agrupar_por in aggregates.rankings:
+            ranking = aggregates.rankings[agrupar_por]
+        else:
+            rows = np.arange(len(snapshot.df)) if keep is None else np.flatnonzero(keep)
+            ranking = top_for_rows(snapshot.df, agrupar_por, rows, n=None)
+        counts = [{agrupar_por: row[agrupar_por], "quantidade_falhas": row["quantidade"]} for row in ranking]
+
+        logger.info(f"Falhas por {agrupar_por} calculadas para {len(counts)} grupos.")
+        return counts
 
     except Exception as e:
         logger.error(f"Erro ao calcular falhas por subsistema: {e}")
@@ -142,9 +190,9 @@ def get_falhas_por_subsistema():
     summary="Quantidade de subsistemas",
     description="Retorna a quantidade de subsistemas únicos no DataFrame."
 )
-def get_quantidade_subsistemas():
+def get_quantidade_subsistemas(dataset: DatasetService = Depends(get_dataset)):
     try:
-        df = service._load_and_clean_df()
+        df = dataset.snapshot().df
         if "subsistema" not in df.columns:
             return {"error": "Coluna 'subsistema' não encontrada na planilha."}
 
@@ -161,25 +209,21 @@ def get_quantidade_subsistemas():
     "/disponibilidade-media",
     status_code=status.HTTP_200_OK,
     summary="Disponibilidade média dos subsistemas (%)",
-    description="Calcula a disponibilidade média de todos os subsistemas."
+    description="Calcula a disponibilidade média dos subsistemas, com os mesmos filtros de /metrics/mttf."
 )
-def get_disponibilidade_media():
+def get_disponibilidade_media(
+    filters: SearchFilters = Depends(_filters),
+    dataset: DatasetService = Depends(get_dataset),
+    store: ReliabilityStore = Depends(get_reliability_store),
+):
     try:
-        df = service._load_and_clean_df()
-        if not {"subsistema", "dt_falha", "hr_falha", "dt_enc", "hr_enc"}.issubset(df.columns):
+        report = _report(dataset, store, filters, "subsistema")
+        if report is None:
             return {"error": "Colunas necessárias não encontradas na planilha."}
 
-        # --- Reutiliza os cálculos de MTTF e MTTR ---
-        mttf_df = pd.DataFrame(get_mttf())
-        mttr_df = pd.DataFrame(get_mttr())
-
-        merged = pd.merge(mttf_df, mttr_df, on="subsistema", how="inner")
-        merged["disponibilidade"] = (
-            merged["mttf_dias"] * 24 / (merged["mttf_dias"] * 24 + merged["mttr_horas"])
-        ) * 100
-
-        # Calcula a disponibilidade média
-        disponibilidade_media = merged["disponibilidade"].mean()
+        disponibilidade_media = report.disponibilidade_media
+        if disponibilidade_media is None:
+            return {"disponibilidade_media": None}
 
         logger.info(f"Disponibilidade média calculada: {disponibilidade_media:.2f}%")
         return {"disponibilidade_media": round(disponibilidade_media, 2)}
@@ -187,3 +231,79 @@ def get_disponibilidade_media():
     except Exception as e:
         logger.error(f"Erro ao calcular a disponibilidade média: {e}")
         return {"error": str(e)}
+
+
+# ------------------------------
+# Rankings pré-calculados
+# ------------------------------
+@router.get(
+    "/top-reclamantes",
+    status_code=status.HTTP_200_OK,
+    summary="Reclamantes que mais registraram falhas",
+    description="Retorna os N reclamantes com mais registros, com quantidade e percentual do total."
+)
+def get_top_reclamantes(n: int = Query(10, ge=1), dataset: DatasetService = Depends(get_dataset)):
+    try:
+        aggregates = get_aggregates(dataset.snapshot())
+        if "reclamante" not in aggregates.rankings:
+            return {"error": "Coluna 'reclamante' não encontrada na planilha."}
+        return aggregates.top("reclamante", n)
+
+    except Exception as e:
+        logger.error(f"Erro ao calcular os principais reclamantes: {e}")
+        return {"error": str(e)}
+
+
+@router.get(
+    "/top-locais",
+    status_code=status.HTTP_200_OK,
+    summary="Locais com mais falhas",
+    description="Retorna os N locais com mais falhas registradas, com quantidade e percentual do total."
+)
+def get_top_locais(n: int = Query(10, ge=1), dataset: DatasetService = Depends(get_dataset)):
+    try:
+        aggregates = get_aggregates(dataset.snapshot())
+        if "local" not in aggregates.rankings:
+            return {"error": "Coluna 'local' não encontrada na planilha."}
+        return aggregates.top("local", n)
+
+    except Exception as e:
+        logger.error(f"Erro ao calcular os principais locais: {e}")
+        return {"error": str(e)}
+
+
+@router.get(
+    "/causas",
+    status_code=status.HTTP_200_OK,
+    summary="Causas mais recorrentes",
+    description=(
+        "Retorna os termos mais frequentes da coluna solucao para um subsistema "
+        "(sigla ou parte dela) ou para um padrão da descrição: "
+        + ", ".join(PATTERNS) + "."
+    )
+)
+def get_causas(
+    subsistema: Optional[str] = None,
+    padrao: Optional[str] = None,
+    n: int = Query(10, ge=1),
+    dataset: DatasetService = Depends(get_dataset),
+):
+    try:
+        snapshot = dataset.snapshot()
+        if "solucao" not in snapshot.df.columns:
+            return {"error": "Coluna 'solucao' não encontrada na planilha."}
+        if bool(subsistema) == bool(padrao):
+            return {"error": "Informe exatamente um dos parâmetros: subsistema ou padrao."}
+
+        aggregates = get_aggregates(snapshot)
+        if padrao:
+            if padrao not in PATTERNS:
+                return {"error": f"Padrão inválido: {padrao}. Use um de: {', '.join(PATTERNS)}."}
+            return aggregates.causes_for_pattern(padrao, n)
+
+        code = subsistema.upper().replace(" ", "")
+        return aggregates.causes_for_subsystems(subsystems_matching(snapshot, code), n)
+
+    except Exception as e:
+        logger.error(f"Erro ao calcular as causas recorrentes: {e}")
+        return {"error": str(e)}
@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Response, status
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+router = APIRouter(prefix="/observability", tags=["Observability"])
+
+
+@router.get(
+    "/prometheus",
+    status_code=status.HTTP_200_OK,
+    summary="Métricas Prometheus",
+    description=(
+        "Formato texto do Prometheus: duração por etapa (`ferrovia_stage_duration_seconds`), "
+        "requisições HTTP, respostas por origem, tokens do Gemini e medidores de cache, "
+        "índice e concorrência."
+    ),
+    response_class=Response,
+)
+def prometheus():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
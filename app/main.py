@@ -1,15 +1,51 @@
+from contextlib import asynccontextmanager
+from typing import Callable, Sequence
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.routers.agents import router as agents_router
+from app.api.v1.routers.health import router as health_router
 from app.api.v1.routers.metrics import router as metrics_router
+from app.api.v1.routers.observability import router as observability_router
+from app.services.registry import ServiceRegistry
+from app.services.warmup import WARMUP_STEPS, warmup_steps_from_env
+from app.utils.instrumentation import observe_request, register_stats, unregister_stats
+
+
+def create_app(
+    registry_factory: Callable[[], ServiceRegistry] = ServiceRegistry,
+    warmup: Sequence[str] = WARMUP_STEPS,
+) -> FastAPI:
+    """Monta a aplicação; `registry_factory` permite trocar os serviços
+    (ex.: LLM e embeddings stub nos benchmarks) e `warmup` escolhe as etapas
+    de aquecimento rodadas em segundo plano ao subir."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        services = registry_factory()
+        app.state.services = services
+        collector = register_stats(services.stats)
+        # Não bloqueia a subida: /health/live responde desde já
+        services.warmup.start(warmup)
+        yield
+        await services.warmup.stop()
+        unregister_stats(collector)
+        services.close()
+
+    app = FastAPI(title="Agent Service", version="1.0.0", lifespan=lifespan)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  
+        allow_credentials=True,
+        allow_methods=["*"],  
+        allow_headers=["*"],
+    )
+    app.middleware("http")(observe_request)
+    app.include_router(health_router)
+    app.include_router(agents_router)
+    app.include_router(metrics_router)
+    app.include_router(observability_router)
+    return app
+
 
-app = FastAPI(title="Agent Service", version="1.0.0")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  
-    allow_credentials=True,
-    allow_methods=["*"],  
-    allow_headers=["*"],
-)
-app.include_router(agents_router)
-app.include_router(metrics_router)
+app = create_app(warmup=warmup_steps_from_env())
@@ -1,294 +1,692 @@
+import asyncio
+import json
+import logging
 import os
-import re
-import unicodedata
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, List, Optional, Tuple
 
-import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
-from langchain.schema import Document
-from langchain_community.vectorstores import Chroma
-
-from langchain_google_genai import (
-    ChatGoogleGenerativeAI,
-)
-# embedding mais rápido
-# from langchain_community.embeddings import FastEmbedEmbeddings
-# embedding mais lento
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate, FewShotPromptTemplate
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from app.services.answer_cache import SemanticAnswerCache, normalize_question
+from app.services.concurrency import RequestCoalescer
+from app.services.dataset_service import DatasetService
+from app.services.embeddings import embeddings_from_env
+from app.services.documents import iter_document_batches
+from app.services.indexer import IndexStats, sync_index
+from app.services.keyword_index import get_keyword_index, reciprocal_rank_fusion
+from app.services.prompts import ExampleSelector, build_prompt, format_examples
+from app.services.query_router import route_question
+from app.services.reliability_store import ReliabilityStore
+from app.services.search_filters import SearchFilters, extract_filters
+from app.utils.instrumentation import ANSWERS, LLM_TOKENS, span
 from app.utils.logger_config import setup_logger
 
+RETRIEVAL_K = 5
+MAX_RETRIEVAL_K = 50
+# Cada busca (vetorial e BM25) traz mais candidatos do que o k final para a fusão
+CANDIDATES_PER_K = 2
+
+
+def _distance(query: np.ndarray, vector: np.ndarray, space: str) -> float:
+    """Distância do Chroma (hnswlib) para o espaço da coleção."""
+    if space == "cosine":
+        return float(1 - query @ vector / (np.linalg.norm(query) * np.linalg.norm(vector)))
+    if space == "ip":
+        return float(1 - query @ vector)
+    return float(np.sum((query - vector) ** 2))
+
 
 class AgentService:
-    def __init__(self) -> None:
+    """Pipeline RAG. Embeddings, vetorstore, LLM e cadeia são criados sob
+    demanda, na primeira requisição que precisar de cada um. `embeddings`,
+    `llm` e `chroma_dir` substituem os padrões (ex.: stubs nos benchmarks);
+    `reliability` é o ReliabilityStore usado nas perguntas de métricas com
+    período ou recorte."""
+
+    def __init__(
+        self,
+        dataset: DatasetService,
+        embeddings: Optional[Embeddings] = None,
+        llm: Optional[BaseChatModel] = None,
+        chroma_dir: Optional[Path] = None,
+        reliability: Optional[ReliabilityStore] = None,
+    ) -> None:
         self.logger = setup_logger(__name__)
         self.logger.info("Initializing AgentService")
-        
+
         load_dotenv()
+        self.dataset = dataset
+        self.reliability = reliability or ReliabilityStore()
+        self._lock = threading.RLock()
+        # Incrementado sempre que o conteúdo do índice vetorial muda
+        self.index_version = 0
+        self._indexed_version: Optional[str] = None
+        self._index_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._refresh_lock = threading.Lock()
+        # Depois de uma sincronização em segundo plano que falhou, espera
+        # este intervalo antes de tentar de novo
+        self.index_refresh_retry_seconds = float(os.getenv("INDEX_REFRESH_RETRY_SECONDS", "30"))
+        self._refresh_failed_at: Optional[float] = None
+        self.cache = SemanticAnswerCache(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        )
+        # Limita chamadas simultâneas ao Gemini por processo
+        self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self._llm_semaphore = asyncio.Semaphore(self.llm_max_concurrency)
+        self.llm_inflight = 0
+        self._coalescer = RequestCoalescer()
+        # Exemplos few-shot por requisição (os mais parecidos com a pergunta)
+        self.few_shot_examples = int(os.getenv("FEW_SHOT_EXAMPLES", "4"))
+        # Nome de um cache de contexto do Gemini (cachedContents/...) com a
+        # instrução de sistema, criado fora da aplicação
+        self.cached_content = os.getenv("GEMINI_CACHED_CONTENT") or None
+        # Fração das requisições com pergunta e contexto completos no log em
+        # INFO (em DEBUG, todas)
+        self.prompt_log_sample_rate = float(os.getenv("LOG_PROMPT_SAMPLE_RATE", "0"))
+
+        # === 1) Caminhos ===
+        self.BASE_DIR = Path(__file__).resolve().parents[2]
+        self.DATA_FILE = dataset.path
+        self.CHROMA_DIR = chroma_dir or self.BASE_DIR / "chromadb"
+        if embeddings is not None:
+            self._embeddings = embeddings
+        if llm is not None:
+            self._llm = llm
+
+    def _get_or_create(self, attr: str, factory: Callable[[], Any]) -> Any:
+        value = self.__dict__.get(attr)
+        if value is None:
+            with self._lock:
+                value = self.__dict__.get(attr)
+                if value is None:
+                    value = factory()
+                    self.__dict__[attr] = value
+        return value
+
+    # ------------------------------
+    # Componentes pesados (lazy)
+    # ------------------------------
+    @property
+    def embeddings(self):
+        return self._get_or_create("_embeddings", self._init_embeddings)
+
+    @property
+    def llm(self):
+        return self._get_or_create("_llm", self._init_llm)
+
+    @property
+    def vectordb(self):
+        return self._get_or_create("_vectordb", self._init_vectorstore)
+
+    @property
+    def prompt(self):
+        return self._get_or_create("_prompt", lambda: build_prompt(include_system=self.cached_content is None))
+
+    @property
+    def example_selector(self):
+        return self._get_or_create("_example_selector", lambda: ExampleSelector(self.embeddings))
+
+    def _init_embeddings(self):
+        # Backend, modelo, lotes e workers vêm de EMBEDDING_* (ver embeddings.py)
+        return embeddings_from_env()
+
+    def _init_llm(self):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             self.logger.error("GOOGLE_API_KEY not found in environment variables")
             raise RuntimeError(
                 "GOOGLE_API_KEY não definida. Ex.: export GOOGLE_API_KEY='sua_chave'"
             )
-
-        # === 1) Caminhos ===
-        self.BASE_DIR = Path(__file__).resolve().parents[2]
-        self.DATA_FILE = self.BASE_DIR / "data" / "dados.xlsx"
-        self.CHROMA_DIR = self.BASE_DIR / "chromadb"
-
-        # === 2) LLM e Embeddings ===
-        self.embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-m3")
-        # self.embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-
-        self.llm = ChatGoogleGenerativeAI(
+        return ChatGoogleGenerativeAI(
             model="gemini-2.0-flash",
             temperature=0,
             google_api_key=api_key,
+            cached_content=self.cached_content,
         )
 
-        # === 3) Inicializa pipeline RAG ===
-        self.retriever = self._init_retriever()
-        self.qa = self._build_qa_chain()
-        self.logger.info("AgentService initialization completed")
-
     # ------------------------------
-    # Helpers de preparação de dados
+    # Vetorstore + Retriever
     # ------------------------------
-    def _slugify_cols(self, cols: List[str]) -> List[str]:
-        out = []
-        for c in cols:
-            c = c.strip().lower()
-            c = unicodedata.normalize("NFKD", c)
-            c = c.encode("ascii", "ignore").decode("utf-8")
-            c = re.sub(r"[^\w\s]", "", c)
-            c = re.sub(r"\s+", "_", c)
-            out.append(c)
-        return out
-
-    def _load_and_clean_df(self) -> pd.DataFrame:
-        self.logger.info(f"Loading data from {self.DATA_FILE}")
-        if not self.DATA_FILE.exists():
-            self.logger.error(f"Data file not found: {self.DATA_FILE}")
-            raise FileNotFoundError(f"Arquivo não encontrado: {self.DATA_FILE}")
+    def _init_vectorstore(self):
+        from langchain_community.vectorstores import Chroma
 
+        self.logger.info("Initializing vector store")
         try:
-            df = pd.read_excel(self.DATA_FILE, header=0)
-            self.logger.info(f"Successfully loaded {len(df)} records from Excel file")
-            df.columns = self._slugify_cols(list(df.columns))
-
-            for col in ["dt_falha", "dt_enc"]:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
-
-            for col in ["hr_falha", "hr_enc"]:
-                if col in df.columns:
-                    df[col] = (
-                        df[col].astype(str).str.strip().str.replace(r"\s+", "", regex=True)
-                    )
-                    df[col] = pd.to_datetime(df[col], format="%H:%M", errors="coerce").dt.time
+            self.CHROMA_DIR.mkdir(parents=True, exist_ok=True)
+            # Uma coleção por modelo: vetores de modelos diferentes não são comparáveis
+            vectordb = Chroma(
+                collection_name=f"falhas-{self.embeddings.slug}",
+                persist_directory=str(self.CHROMA_DIR),
+                embedding_function=self.embeddings
+            )
+            if vectordb._collection.count() == 0:
+                self.logger.info("Creating new Chroma database")
+                self._sync_into(vectordb)
+            else:
+                # Índice existente: a diferença para a planilha é aplicada em segundo plano
+                self.logger.info("Loading existing Chroma database")
+            self.index_version += 1
+            self.logger.info("Vector store initialization completed")
+            return vectordb
+        except Exception as e:
+            self.logger.error(f"Error initializing vector store: {str(e)}")
+            raise
 
-            for col in ["solicitacao", "ordem"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors="coerce")
+    def _sync_into(self, vectordb) -> IndexStats:
+        snapshot = self.dataset.snapshot()
+        with span("index_sync"):
+            stats = sync_index(vectordb, iter_document_batches(snapshot.df))
+        self._indexed_version = snapshot.version
+        self.logger.info(f"Index synchronized with dataset {snapshot.version[:12]}: {stats}")
+        return stats
 
-            for col in ["subsistema", "local", "prioridade", "descricao", "solucao", "reclamante"]:
-                if col in df.columns:
-                    df[col] = df[col].astype("string")
+    def sync_index(self) -> IndexStats:
+        """Atualiza o índice com a versão atual da planilha, embedando só
+        as linhas novas ou alteradas. Seguro para rodar com a API no ar."""
+        with self._index_lock:
+            stats = self._sync_into(self.vectordb)
+            if stats.changed:
+                self.index_version += 1
+            return stats
 
-            return df
+    def _refresh_index_in_background(self) -> None:
+        failed_at: Optional[float] = None
+        try:
+            self.sync_index()
         except Exception as e:
-            self.logger.error(f"Error loading data: {str(e)}")
-            raise
+            failed_at = time.monotonic()
+            self.logger.error(
+                f"Error refreshing index: {str(e)}; retrying in {self.index_refresh_retry_seconds:g} s"
+            )
+        with self._refresh_lock:
+            self._refresh_failed_at = failed_at
+            self._refresh_thread = None
 
-    def _df_to_documents(self, df: pd.DataFrame) -> List[Document]:
-        docs: List[Document] = []
-        for idx, row in df.iterrows():
-            text = " | ".join([f"{col}: {row[col]}" for col in df.columns])
-            docs.append(Document(page_content=text, metadata={"row_index": int(idx)}))
-        return docs
+    def _maybe_refresh_index(self, version: str) -> None:
+        """Agenda no máximo uma sincronização por vez; após uma falha, só
+        tenta de novo depois de INDEX_REFRESH_RETRY_SECONDS."""
+        if version == self._indexed_version:
+            return
+        with self._refresh_lock:
+            if self._refresh_thread is not None:
+                return
+            failed_at = self._refresh_failed_at
+            if failed_at is not None and time.monotonic() - failed_at < self.index_refresh_retry_seconds:
+                return
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_index_in_background, name="index-refresh", daemon=True
+            )
+            self._refresh_thread.start()
 
-    # ------------------------------
-    # Vetorstore + Retriever
-    # ------------------------------
-    def _init_retriever(self):
-        self.logger.info("Initializing retriever")
-        try:
-            if self.CHROMA_DIR.exists() and any(self.CHROMA_DIR.iterdir()):
-                self.logger.info("Loading existing Chroma database")
-                vectordb = Chroma(
-                    persist_directory=str(self.CHROMA_DIR),
-                    embedding_function=self.embeddings
-                )
-            else:
-                self.logger.info("Creating new Chroma database")
-                df = self._load_and_clean_df()
-                documents = self._df_to_documents(df)
-                self.CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-                vectordb = Chroma.from_documents(
-                    documents=documents,
-                    embedding=self.embeddings,
-                    persist_directory=str(self.CHROMA_DIR)
+    def warm_retrieval(self) -> None:
+        """Carrega tudo o que a busca usa (modelo, índice vetorial, BM25 e
+        exemplos few-shot) e agenda a sincronização se a planilha mudou."""
+        self._cache_generation()
+        get_keyword_index(self.dataset.snapshot())
+        self.example_selector
+
+    def _dense_many(
+        self, embeddings: List[List[float]], k: int, filters: List[Optional[SearchFilters]]
+    ) -> List[List[Tuple[Document, float]]]:
+        """Uma consulta ao Chroma por grupo de perguntas com o mesmo filtro;
+        os filtros viram um `where` nos metadados, aplicado antes da busca.
+        A relevância é a função do Chroma para a métrica da coleção: fica em
+        [0, 1] só com embeddings normalizados (norma 1); com outros vetores
+        pode sair do intervalo e vale apenas para ordenar."""
+        groups: Dict[str, List[int]] = {}
+        wheres: Dict[str, Optional[Dict[str, Any]]] = {}
+        for i, item in enumerate(filters):
+            where = item.to_where() if item is not None else None
+            key = json.dumps(where, sort_keys=True)
+            groups.setdefault(key, []).append(i)
+            wheres[key] = where
+
+        relevance = self.vectordb._select_relevance_score_fn()
+        out: List[List[Tuple[Document, float]]] = [[] for _ in embeddings]
+        for key, positions in groups.items():
+            with span("vector_search"):
+                found = self.vectordb._collection.query(
+                    query_embeddings=[embeddings[i] for i in positions],
+                    n_results=k,
+                    where=wheres[key],
+                    include=["documents", "metadatas", "distances"],
                 )
-            self.logger.info("Retriever initialization completed")
-            return vectordb.as_retriever(search_type="similarity", search_kwargs={"k": 5})
-        except Exception as e:
-            self.logger.error(f"Error initializing retriever: {str(e)}")
-            raise
+            for row, i in enumerate(positions):
+                out[i] = [
+                    (Document(id=doc_id, page_content=text, metadata=meta or {}), relevance(distance))
+                    for doc_id, text, meta, distance in zip(
+                        found["ids"][row], found["documents"][row], found["metadatas"][row], found["distances"][row]
+                    )
+                ]
+        return out
 
-    # ------------------------------
-    # Prompt few-shot + Cadeia RAG
-    # ------------------------------
-    def _build_qa_chain(self):
-        examples = [
-            {
-                "question": "Calcule o MTTF do subsistema SINCDVCAV.",
-                "instruction": "Use dt_falha/hr_falha para os subsistemas cuja sigla contém SINCDVCAV; calcule intervalos entre falhas e a média.",
-                "answer": "o MTTF do subsistema SINCDVCAV é de aproximadamente (resultado da média) horas.",
-            },
-            {
-                "question": "Qual é o MTTR do subsistema SINCDVFLO?",
-                "instruction": "Use (dt_enc/hr_enc) - (dt_falha/hr_falha) por registro para os subsistemas cuja sigla contém SINCDVFLO e tire a média.",
-                "answer": "O MTTR do subsistema SINCDVFLO é de aproximadamente (resultado da média) horas.",
-            },
-            {
-                "question": "Qual é a disponibilidade do subsistema SINCDVREC?",
-                "instruction": "Calcule o MTTF e o MTTR por registro para os subsistemas cuja sigla contém SINCDVREC, tire calcule a disponibilidade dividindo o MTTF por (MTTF + MTTR).",
-                "answer": "O MTTR do subsistema SINCDVFLO é de aproximadamente (resultado da disponibilidade em termos percentuais).",
-            },
-            {
-                "question": "Qual subsistema apresenta mais falhas?",
-                "instruction": "Conte ocorrências por subsistema (siglas iguais) e estime porcentagem para cada um.",
-                "answer": "O subsistema com mais falhas registradas é o (resultado da contagem do subsistema que mais falha), representando cerca de (resultado da razão em termos percentuais) do total de ocorrências.",
-            },
-            {
-                "question": "Qual subsistema apresenta o maior MTTF?",
-                "instruction": "Use dt_falha/hr_falha para todos os subsistemas e calcule intervalos entre falhas e a média; liste os 10 subsistemas com maior MTTF",
-                "answer": "O subsistema que apresenta o maior MTTF é o (subsistema que possui o resultado com maior MTTF) com tempo médio entre falhas de aproximadamente (resultado do maior MTTF) horas.",
-            },
-            {
-                "question": "Qual subsistema apresenta o menor MTTF?",
-                "instruction": "Use dt_falha/hr_falha para todos os subsistemas e calcule intervalos entre falhas e a média; liste os 10 subsistemas com menor MTTF",
-                "answer": "O subsistema que apresenta o menor MTTF é o (subsistema que possui o resultado com menor MTTF) com tempo médio entre falhas de aproximadamente (resultado do menor MTTF) horas.",
-            },
-             {
-                "question": "Qual subsistema apresenta o maior MTTR?",
-                "instruction": "Use (dt_enc/hr_enc) - (dt_falha/hr_falha) para todos os subsistemas; liste os 10 subsistemas com maior MTTF",
-                "answer": "O subsistema que apresenta o maior MTTR é o (subsistema que possui o resultado com maior MTTR) com tempo médio de recuperação de aproximadamente (resultado do maior MTTF) horas.",
-            },
-            {
-                "question": "Qual subsistema apresenta o menor MTTR?",
-                "instruction": "Use (dt_enc/hr_enc) - (dt_falha/hr_falha) para todos os subsistemas; liste os 10 subsistemas com menor MTTF",
-                "answer": "O subsistema que apresenta o menor MTTR é o (subsistema que possui o resultado com menor MTTR) com tempo médio de recuperação de aproximadamente (resultado do menor MTTF) horas.",
-            },
-             {
-                "question": "Qual é o subsistema que possui a maior disponibilidade?",
-                "instruction": "De posse dos valores de MTTF e MTTR de cada subsistema, calcule a disponibilidade de cada subsistema dividindo o MTTF por (MTTF + MTTR) e liste os 10 subsistemas com a maior disponibilidade.",
-                "answer": "O subsistema que possui a maior disponibilidade é o (subsistema que possui o resultado da maior disponibilidade) = (resultado da maior disponibilidade em termos percentuais).",
-            },
-            {
-                "question": "Qual é o subsistema que possui a menor disponibilidade?",
-                "instruction": "De posse dos valores de MTTF e MTTR de cada subsistema, calcule a disponibilidade de cada subsistema dividindo o MTTF por (MTTF + MTTR) e liste os 10 subsistemas com a menor disponibilidade.",
-                "answer": "O subsistema que possui a menor disponibilidade é o (subsistema que possui o resultado da menor disponibilidade) = (resultado da menor disponibilidade em termos percentuais).",
-            },
-            {
-                "question": "Qual é o reclamente que mais registrou falhas?",
-                "instruction": "Listar os 10 reclamantes (coluna reclamante) cujo nome apresenta maior incidencia nos registros",
-                "answer": "O reclamante que mais registrou falhas foi (nome do reclamante com mais registros encontrados).",
-            },
-            {
-                "question": "Quais são os reclamentes que mais registraram falhas?",
-                "instruction": "Listar os 10 reclamantes (coluna reclamante) cujo nome apresenta maior incidencia nos registros, listar o número de registros de cada reclamante e apresentar a razão (em termos percentuais) que representa esse registro do total",
-                "answer": "Os 10 reclamantes que mais registraram falhas foram: (nomes dos reclamantes, seguido no número de falhas que cada um registrou e o quanto isso significa, em termos percentuais, do total de falhas registradas).",
-            },
-            {
-                "question": "Quais são as causas mais recorrentes de falha do subsistema SINCDVAFO?",
-                "instruction": "Listar apenas os subsistemas que correspondam a sigla do subsistema (SINCDVAFO, no caso desse exemplo), uma vez listados os subsistemas verificar na coluna solucao quais são os termos que apresentam maior recorrência de registro (exemplo: EMENDAS OXIDADAS; CODIGO ZERO EM TODOS OS CIRCUITOS; FALSA OCUPAC?O CONSTANTE; etc...)",
-                "answer": "As causas de falha mais recorrentes registradas para o subsistema SINCDVAFO foram: (listar as causas com maior recorrência encontradas).",
-            },
-            {
-                "question": "Qual é a causa mais recorrente de uma falha de falsa ocupação (F.O)?",
-                "instruction": "Na coluna descricao, liste as falhas que possuem o termo FO, F.O, FALSA OCUPAC?O; em seguida analise na coluna solucao quais são os termos mais recorrentes apresentados (ex: POWER AMPLIFIER COM TENSAO DE SAIDA BAIXA; OBJETO METALICO ENTRE TRILHO PROVOCANDO CURTO; CONEXOES FOLGADAS NA CIA; REAPERTOS NAS PORCAS E AJUSTAMOS AS BARRAS; FOLGA NA CONECC?O DA ANTENA NA CIA; FALTA  DE END POST; DISJUNTOR DA APS 2 0/31 DESARMADO; FUSIVEL SINALIZAC?O ABERTO; PORTAS ABERTAS E ELEMENTOS MEXENDO NA CASE; DISJUNTOR GERAL DESOPERADO NA APS 7; TALAS DANIFICADAS NAS ESTACAS; etc...) em seguida, o número de registros de cada termo e  a razão (em termos percentuais) em relação ao total de causas.",
-                "answer": "A causa mais recorrente registrada para falhas de falsa ocupação (F.O) é (resultado da causa mais recorrente registrada na coluna solucao), representando um total de (resultado do número de registros de causa recorrente) - (resultado da razão, em termos percentuais, da causa mais recorrente registrada na coluna solucao) do total de ocorrências.",
-            },
-            {
-                "question": "Qual é a causa mais recorrente de uma falha de código zero?",
-                "instruction": "Na coluna descricao, liste as falhas que possuem o termo código zero, COD 0, CODIGO ZERO; em seguida analise na coluna solucao quais são os termos mais recorrentes apresentados (ex: PAR CASADO DEFEITUOSO; RETIRADO O MAU CONTATO; FUSIVEL DE ATC FORA DO LOCAL; NADA CONSTATADO; A FALHA OCORRE EM FUNC?O DAS FALSAS NOS CDV'S;  A FALHA N?O OCORREU; CONDIC?O NORMAL; REVIS?O NAS CONEX?ES NA CASE E VIA; etc...) em seguida, o número de registros de cada termo e  a razão (em termos percentuais) em relação ao total de causas.",
-                "answer": "A causa mais recorrente registrada para falhas de COD 0 é (resultado da causa mais recorrente registrada na coluna solucao), representando um total de (resultado do número de registros de causa recorrente) - (resultado da razão, em termos percentuais, da causa mais recorrente registrada na coluna solucao) do total de ocorrências.",
-            },
-            {
-                "question": "Qual local apresenta maior ocorrência falhas?",
-                "instruction": "Na coluna local, liste os 10 locais com maior registro de ocorrências; em seguida exiba o número de ocorrências e a razão pelo total (em termos percentuais).",
-                "answer": "O local com mais falhas registradas é o (resultado da contagem do local que mais falha), representando cerca de (resultado da razão em termos percentuais) do total de ocorrências registradas.",
-            },
+    def hybrid_retrieve(
+        self, text: str, embedding: List[float], k: int = RETRIEVAL_K, filters: Optional[SearchFilters] = None
+    ) -> List[Tuple[Document, float]]:
+        """Funde (RRF) a busca vetorial com o BM25 sobre os mesmos documentos.
+        Filtros da requisição e os citados na pergunta restringem as duas buscas.
+        Os documentos vêm na ordem da fusão, cada um com sua relevância
+        vetorial (a de _dense_many) e o valor da fusão em metadata["rrf_score"]."""
+        return self.hybrid_retrieve_many([text], [embedding], k, filters)[0]
+
+    def hybrid_retrieve_many(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        k: int = RETRIEVAL_K,
+        filters: Optional[SearchFilters] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        snapshot = self.dataset.snapshot()
+        item_filters = [(filters or SearchFilters()).merge(extract_filters(t, snapshot)) for t in texts]
+        for item in item_filters:
+            if not item.empty:
+                self.logger.info(f"Search filters: {item}")
+        candidates = k * CANDIDATES_PER_K
+        dense = self._dense_many(embeddings, candidates, item_filters)
+        index = get_keyword_index(snapshot)
+        with span("keyword_search"):
+            keyword = [index.search(text, candidates, item) for text, item in zip(texts, item_filters)]
+        fused = [reciprocal_rank_fusion([hits, found], k) for hits, found in zip(dense, keyword)]
+        similarities = self._similarities(embeddings, dense, fused)
+        return [
+            [
+                (Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "rrf_score": rrf}), score)
+                for (doc, rrf), score in zip(hits, scores)
+            ]
+            for hits, scores in zip(fused, similarities)
         ]
 
-        example_template = (
-            "Pergunta: {question}\Instrução: {instruction}\nResposta: {answer}"
-        )
-        example_prompt = PromptTemplate(
-            input_variables=["question", "instruction", "answer"],
-            template=example_template
-        )
+    def _similarities(
+        self,
+        embeddings: List[List[float]],
+        dense: List[List[Tuple[Document, float]]],
+        fused: List[List[Tuple[Document, float]]],
+    ) -> List[List[Optional[float]]]:
+        """Relevância vetorial de cada documento fundido. Os que só o BM25
+        trouxe têm o vetor lido do Chroma e a distância calculada aqui, na
+        mesma métrica da coleção."""
+        known = [{doc.id: score for doc, score in hits} for hits in dense]
+        missing = sorted({doc.id for hits, seen in zip(fused, known) for doc, _ in hits if doc.id not in seen})
+        vectors: Dict[str, np.ndarray] = {}
+        if missing:
+            found = self.vectordb._collection.get(ids=missing, include=["embeddings"])
+            vectors = {doc_id: np.asarray(vec, dtype=np.float64) for doc_id, vec in zip(found["ids"], found["embeddings"])}
+        relevance = self.vectordb._select_relevance_score_fn()
+        space = (self.vectordb._collection.metadata or {}).get("hnsw:space", "l2")
+
+        out: List[List[Optional[float]]] = []
+        for embedding, hits, seen in zip(embeddings, fused, known):
+            query = np.asarray(embedding, dtype=np.float64)
+            scores: List[Optional[float]] = []
+            for doc, _ in hits:
+                if doc.id in seen:
+                    scores.append(seen[doc.id])
+                elif doc.id in vectors:
+                    scores.append(relevance(_distance(query, vectors[doc.id], space)))
+                else:
+                    scores.append(None)
+            out.append(scores)
+        return out
+
+    @staticmethod
+    def _format_sources(hits: List[Tuple[Document, float]]) -> List[Dict[str, Any]]:
+        """`score` é a relevância vetorial; `rrf_score`, o valor da fusão
+        que define a ordem."""
+        sources = []
+        for doc, score in hits:
+            rrf = doc.metadata.get("rrf_score")
+            sources.append(
+                {
+                    "row_index": doc.metadata.get("row_index"),
+                    "score": round(float(score), 4) if score is not None else None,
+                    "rrf_score": round(float(rrf), 4) if rrf is not None else None,
+                    "content": doc.page_content,
+                }
+            )
+        return sources
 
-        system_instruction = (
-            """Você é um assistente especializado em analisar dados de falhas/incidentes 
-            provenientes de uma base de dados que contem esses campos: solicitacao, subsistema, local, dt_falha, hr_falha, 
-            prioridade, descricao, dt_enc, hr_enc, solucao, ordem, reclamante. 
-            Com base nesses dados, responda a perguntas relacionadas a métricas como MTTF (Mean Time To Failure), 
-            MTTR (Mean Time To Repair), frequência de falhas por subsistema, tempos médios de reparo, entre outras análises pertinentes. 
-            Forneça respostas claras e objetivas, utilizando os dados disponíveis para fundamentar suas respostas
-            - utilize as instruções fornecidas nos exemplos para formatar suas respostas de maneira consistente.
-            - não responda as instruções dos exemplos, elas são apenas para formatar suas respostas.
-            - não responda com perguntas, apenas forneça as respostas solicitadas.
-            - calcule os valores quando necessário, utilizando os dados fornecidos.
-            - se o usuário pedir um relatório, forneça uma análise detalhada com base nos dados disponíveis, incluindo métricas como mttf, mttr, frequência de falhas, tempos médios de reparo, entre outras análises pertinentes.
-
-            """
+    # ------------------------------
+    # Prompt few-shot
+    # ------------------------------
+    def _build_messages(
+        self, text: str, embedding: List[float], hits: List[Tuple[Document, float]]
+    ) -> List[BaseMessage]:
+        with span("prompt_build"):
+            examples = self.example_selector.select(embedding, self.few_shot_examples)
+            context = "\n".join(doc.page_content for doc, _ in hits)
+            messages = self.prompt.format_messages(
+                examples=format_examples(examples), question=text, context=context
+            )
+        size = sum(len(m.content) for m in messages)
+        self.logger.info(
+            f"LLM input: {size} chars ({len(examples)} examples, {len(hits)} context rows, "
+            f"context {len(context)} chars)",
+            extra={"input_chars": size, "examples": len(examples), "context_rows": len(hits), "context_chars": len(context)},
         )
-        
-
-        few_shot_prompt = FewShotPromptTemplate(
-            examples=examples,
-            example_prompt=example_prompt,
-            prefix=system_instruction,
-            suffix="Pergunta do usuário: {question}\nContexto recuperado:\n{context}\nResposta:",
-            input_variables=["context", "question"]
+        return messages
+
+    def _log_prompt(self, text: str, hits: List[Tuple[Document, float]]) -> None:
+        """Pergunta e contexto completos só em DEBUG ou na amostra de
+        LOG_PROMPT_SAMPLE_RATE: são vários KB por requisição."""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            level = logging.DEBUG
+        elif self.prompt_log_sample_rate > 0 and random.random() < self.prompt_log_sample_rate:
+            level = logging.INFO
+        else:
+            return
+        context = "\n".join(doc.page_content for doc, _ in hits)
+        self.logger.log(
+            level,
+            "Prompt payload",
+            extra={"question": text, "context": context, "context_rows": len(hits)},
         )
 
-        qa = RetrievalQA.from_chain_type(
-            llm=self.llm,
-            retriever=self.retriever,
-            chain_type="stuff",
-            chain_type_kwargs={"prompt": few_shot_prompt},
-            return_source_documents=False
+    def _log_usage(self, message: BaseMessage) -> None:
+        usage = getattr(message, "usage_metadata", None)
+        if not usage:
+            return
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        LLM_TOKENS.labels("input").inc(usage.get("input_tokens") or 0)
+        LLM_TOKENS.labels("cached").inc(cached or 0)
+        LLM_TOKENS.labels("output").inc(usage.get("output_tokens") or 0)
+        self.logger.info(
+            f"LLM usage: {usage.get('input_tokens')} input tokens ({cached} cached), "
+            f"{usage.get('output_tokens')} output tokens",
+            extra={
+                "input_tokens": usage.get("input_tokens"),
+                "cached_tokens": cached,
+                "output_tokens": usage.get("output_tokens"),
+            },
         )
-        return qa
+
+    @asynccontextmanager
+    async def _llm_slot(self):
+        """Vaga entre as LLM_MAX_CONCURRENCY chamadas simultâneas ao Gemini."""
+        with span("llm_queue"):
+            await self._llm_semaphore.acquire()
+        self.llm_inflight += 1
+        try:
+            yield
+        finally:
+            self.llm_inflight -= 1
+            self._llm_semaphore.release()
+
+    def close(self) -> None:
+        """Libera o que os componentes mantêm aberto (pool de embeddings)."""
+        close = getattr(self.__dict__.get("_embeddings"), "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Cache, índice e concorrência, para os medidores do Prometheus.
+        Não inicializa componentes que ainda não foram usados."""
+        cache = self.cache.stats()
+        vectordb = self.__dict__.get("_vectordb")
+        return {
+            "answer_cache_entries": cache["entries"],
+            "answer_cache_hits_total": cache["hits"],
+            "answer_cache_semantic_hits_total": cache["semantic_hits"],
+            "answer_cache_misses_total": cache["misses"],
+            "answer_cache_invalidations_total": cache["invalidations"],
+            "answer_cache_hit_rate": cache["hit_rate"],
+            "index_version": self.index_version,
+            "index_documents": vectordb._collection.count() if vectordb is not None else None,
+            "index_refreshing": float(self._refresh_thread is not None),
+            "llm_inflight": self.llm_inflight,
+            "llm_max_concurrency": self.llm_max_concurrency,
+            "coalescer_inflight": self._coalescer.inflight,
+            "coalesced_requests_total": self._coalescer.coalesced,
+        }
 
     # ------------------------------
     # Método usado pelo endpoint
     # ------------------------------
-    def echo(self, text: str) -> str:
+    def _cache_generation(self) -> Tuple[str, int]:
+        self.vectordb  # garante o índice carregado antes de ler sua versão
+        version = self.dataset.snapshot().version
+        self._maybe_refresh_index(version)
+        return version, self.index_version
+
+    async def aecho(
+        self, text: str, k: Optional[int] = None, filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
+        # Perguntas idênticas em andamento compartilham a mesma chamada ao LLM
+        key = (normalize_question(text), k, filters)
+        result = await self._coalescer.run(key, lambda: self._aecho(text, k, filters))
+        return dict(result)
+
+    async def _aprepare(
+        self, text: str, k: Optional[int] = None, filters: Optional[SearchFilters] = None
+    ) -> Tuple[Hashable, Optional[List[float]], Optional[Dict[str, Any]], List[Tuple[Document, float]]]:
+        """Tenta responder sem o LLM (métricas calculadas ou cache) e, se não
+        der, faz a busca. Retorna (geração, embedding, resposta pronta, documentos).
+        Com k diferente do padrão ou filtros na requisição o cache não é usado
+        (geração None)."""
+        snapshot = await asyncio.to_thread(self.dataset.snapshot)
+        with span("route"):
+            routed = route_question(text, snapshot, filters, self.reliability)
+        if routed is not None:
+            self.logger.info(f"Answered from metrics (intent {routed.intent})")
+            ANSWERS.labels("metrics").inc()
+            ready = {"text": routed.text, "sources": [], "route": routed.intent, "data": routed.data}
+            return None, None, {**ready, "cached": False}, []
+
+        # A primeira chamada carrega modelo e índice: fora do event loop
+        generation = await asyncio.to_thread(self._cache_generation)
+        if k not in (None, RETRIEVAL_K) or (filters is not None and not filters.empty):
+            generation = None
+        if generation is not None:
+            cached = self.cache.get_exact(text, generation)
+            if cached is not None:
+                self.logger.info("Answer served from cache (exact match)")
+                ANSWERS.labels("cache_exact").inc()
+                return generation, None, {**cached, "cached": True}, []
+
+        with span("query_embedding"):
+            embedding = await self.embeddings.aembed_query(text)
+        if generation is not None:
+            cached = self.cache.get_similar(text, embedding, generation)
+            if cached is not None:
+                self.logger.info("Answer served from cache (semantic match)")
+                ANSWERS.labels("cache_semantic").inc()
+                return generation, embedding, {**cached, "cached": True}, []
+
+        hits = await asyncio.to_thread(self.hybrid_retrieve, text, embedding, k or RETRIEVAL_K, filters)
+        self._log_prompt(text, hits)
+        return generation, embedding, None, hits
+
+    async def _aecho(
+        self, text: str, k: Optional[int] = None, filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
         self.logger.info(f"Processing query: {text[:100]}...")
         try:
-            # Get context documents first
-            context_docs = self.retriever.get_relevant_documents(text)
-            context = "\n".join([doc.page_content for doc in context_docs])
-            
-            # Log the complete prompt
-            self.logger.info("Complete prompt details:")
-            self.logger.info(f"User question: {text}")
-            self.logger.info(f"Retrieved context: {context}")
-            
-            # Process the query
-            result = self.qa.invoke({"query": text})
-            response = (result.get("result") or "").strip()
-            
+            generation, embedding, ready, hits = await self._aprepare(text, k, filters)
+            if ready is not None:
+                return ready
+            result = await self._agenerate(text, generation, embedding, hits)
             self.logger.info("Query processed successfully")
-            return response
+            return result
         except Exception as e:
             error_msg = f"Error processing query: {str(e)}"
             self.logger.error(error_msg)
-            return f"Erro ao processar a pergunta: {e}"
+            return {"text": f"Erro ao processar a pergunta: {e}", "sources": []}
+
+    async def _agenerate(
+        self, text: str, generation: Hashable, embedding: List[float], hits: List[Tuple[Document, float]]
+    ) -> Dict[str, Any]:
+        messages = await asyncio.to_thread(self._build_messages, text, embedding, hits)
+        async with self._llm_slot():
+            with span("llm_call"):
+                response = await self.llm.ainvoke(messages)
+        self._log_usage(response)
+        ANSWERS.labels("llm").inc()
+
+        result = {"text": response.content.strip(), "sources": self._format_sources(hits)}
+        if generation is not None:
+            self.cache.put(text, embedding, generation, result)
+        return {**result, "cached": False}
+
+    async def abatch(
+        self, texts: List[str], k: Optional[int] = None, filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
+        """Responde várias perguntas de uma vez: embeddings de consulta em
+        paralelo (o mesmo caminho de aecho, fora do cache de documentos),
+        buscas vetoriais agrupadas e chamadas ao LLM em paralelo (limitadas
+        por LLM_MAX_CONCURRENCY). Erros e tempos são informados por item:
+        completed_ms é o instante em que o item ficou pronto, contado do
+        início do lote, e llm_ms o tempo da sua própria chamada ao LLM."""
+        start = time.perf_counter()
+        timing: Dict[str, float] = {}
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+
+        def elapsed() -> float:
+            return round((time.perf_counter() - start) * 1000, 1)
+
+        def finish(i: int, payload: Dict[str, Any], **item_timing: float) -> None:
+            results[i] = {**payload, "timing": {**item_timing, "completed_ms": elapsed()}}
+
+        # Perguntas repetidas no lote são respondidas uma vez
+        first: Dict[str, int] = {}
+        for i, text in enumerate(texts):
+            first.setdefault(normalize_question(text), i)
+        pending = sorted(first.values())
+
+        snapshot = await asyncio.to_thread(self.dataset.snapshot)
+        waiting = []
+        for i in pending:
+            with span("route"):
+                routed = route_question(texts[i], snapshot, filters, self.reliability)
+            if routed is None:
+                waiting.append(i)
+                continue
+            ANSWERS.labels("metrics").inc()
+            finish(i, {"text": routed.text, "sources": [], "route": routed.intent, "data": routed.data, "cached": False})
+        pending = waiting
+
+        if pending:
+            generation: Hashable = None
+            vectors: Dict[int, List[float]] = {}
+            hits_per_item: List[List[Tuple[Document, float]]] = []
+            try:
+                generation = await asyncio.to_thread(self._cache_generation)
+                if k not in (None, RETRIEVAL_K) or (filters is not None and not filters.empty):
+                    generation = None
+                if generation is not None:
+                    waiting, source = [], "cache_exact"
+                    for i in pending:
+                        cached = self.cache.get_exact(texts[i], generation)
+                        if cached is None:
+                            waiting.append(i)
+                        else:
+                            ANSWERS.labels(source).inc()
+                            finish(i, {**cached, "cached": True})
+                    pending = waiting
+
+                if pending:
+                    with span("batch_embedding"):
+                        embedded = await asyncio.gather(
+                            *(self.embeddings.aembed_query(texts[i]) for i in pending)
+                        )
+                    vectors = dict(zip(pending, embedded))
+                    timing["embedding_ms"] = elapsed()
+                if generation is not None:
+                    waiting, source = [], "cache_semantic"
+                    for i in pending:
+                        cached = self.cache.get_similar(texts[i], vectors[i], generation)
+                        if cached is None:
+                            waiting.append(i)
+                        else:
+                            ANSWERS.labels(source).inc()
+                            finish(i, {**cached, "cached": True})
+                    pending = waiting
+
+                if pending:
+                    hits_per_item = await asyncio.to_thread(
+                        self.hybrid_retrieve_many,
+                        [texts[i] for i in pending],
+                        [vectors[i] for i in pending],
+                        k or RETRIEVAL_K,
+                        filters,
+                    )
+                    timing["retrieval_ms"] = elapsed()
+            except Exception as e:
+                self.logger.error(f"Error preparing batch: {str(e)}")
+                for i in pending:
+                    finish(i, {"error": str(e)})
+                pending = []
+
+            async def answer(i: int, hits: List[Tuple[Document, float]]) -> None:
+                item_start = time.perf_counter()
+                try:
+                    payload = await self._agenerate(texts[i], generation, vectors[i], hits)
+                    finish(i, payload, llm_ms=round((time.perf_counter() - item_start) * 1000, 1))
+                except Exception as e:
+                    self.logger.error(f"Error processing batch item {i}: {str(e)}")
+                    finish(i, {"error": str(e)})
+
+            await asyncio.gather(*(answer(i, hits) for i, hits in zip(pending, hits_per_item)))
+
+        for i, text in enumerate(texts):
+            if results[i] is None:
+                results[i] = results[first[normalize_question(text)]]
+        timing["total_ms"] = elapsed()
+        self.logger.info(f"Batch of {len(texts)} questions processed in {timing['total_ms']} ms")
+        return {"results": results, "timing": timing}
+
+    async def astream(
+        self, text: str, k: Optional[int] = None, filters: Optional[SearchFilters] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Gera eventos ("token", trecho) enquanto o LLM responde e, ao fim,
+        ("done", {sources, cached, timing}) ou ("error", mensagem)."""
+        self.logger.info(f"Streaming query: {text[:100]}...")
+        start = time.perf_counter()
+        timing: Dict[str, float] = {}
+        try:
+            generation, embedding, ready, hits = await self._aprepare(text, k, filters)
+            timing["retrieval_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if ready is not None:
+                yield "token", ready["text"]
+                timing["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                extra = {key: ready[key] for key in ("route", "data") if key in ready}
+                yield "done", {"sources": ready["sources"], "cached": ready["cached"], **extra, "timing": timing}
+                return
+
+            messages = await asyncio.to_thread(self._build_messages, text, embedding, hits)
+            parts: List[str] = []
+            message: Optional[BaseMessageChunk] = None
+            async with self._llm_slot():
+                with span("llm_stream"):
+                    async for chunk in self.llm.astream(messages):
+                        message = chunk if message is None else message + chunk
+                        if not chunk.content:
+                            continue
+                        if not parts:
+                            timing["first_token_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                        parts.append(chunk.content)
+                        yield "token", chunk.content
+            if message is not None:
+                self._log_usage(message)
+            ANSWERS.labels("llm").inc()
+
+            sources = self._format_sources(hits)
+            if generation is not None:
+                self.cache.put(text, embedding, generation, {"text": "".join(parts).strip(), "sources": sources})
+            timing["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.logger.info("Streamed query processed successfully")
+            yield "done", {"sources": sources, "cached": False, "timing": timing}
+        except Exception as e:
+            self.logger.error(f"Error streaming query: {str(e)}")
+            yield "error", f"Erro ao processar a pergunta: {e}"
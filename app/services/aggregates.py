@@ -0,0 +1,187 @@
+"""Agregados materializados por versão do dataset: contagens e participação
+por subsistema, local e reclamante, termos recorrentes da coluna solucao e
+um índice invertido dos termos da descricao."""
+import bisect
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.dataset_service import DatasetSnapshot
+from app.utils.text import bigrams, normalize_upper, tokenize
+
+DIMENSIONS = ["subsistema", "local", "reclamante"]
+SUBSYSTEM_CODE_RE = re.compile(r"\bSINC[A-Z0-9]+\b", re.IGNORECASE)
+
+# Padrões de descricao: alternativas de termo (unigrama ou bigrama) e se
+# valem como prefixo ("FALSA OCUPA" cobre OCUPACAO, OCUPAC?O, OCUPACOES...)
+PATTERNS: Dict[str, List[Tuple[str, bool]]] = {
+    "falsa-ocupacao": [("F.O", False), ("FO", False), ("FALSA OCUPA", True)],
+    "codigo-zero": [
+        ("COD 0", False), ("COD ZERO", False), ("COD.0", False),
+        ("CODIGO 0", False), ("CODIGO ZERO", False),
+    ],
+}
+PATTERN_LABELS = {
+    "falsa-ocupacao": "falhas de falsa ocupação (F.O)",
+    "codigo-zero": "falhas de código zero (COD 0)",
+}
+
+_SYMPTOM_RE = r"\bF\.?\s?O\b|FALSA\s+OCUPA|\bCOD(?:IGO)?\.?\s*(?:0|ZERO)\b"
+# Frases de encerramento que não dizem nada sobre a causa
+_FILLER_RE = r"^(?:O |FOI |SISTEMA |CIRCUITO |CDV )*(?:FOI )?NORMALIZADO$"
+
+
+def _counts_table(counts: pd.Series, label: str) -> pd.DataFrame:
+    counts = counts[counts > 0].sort_values(ascending=False)
+    total = counts.sum()
+    table = pd.DataFrame({"quantidade": counts, "percentual": (counts / total * 100).round(2) if total else 0.0})
+    table.index.name = label
+    return table
+
+
+def _records(table: pd.DataFrame) -> List[Dict[str, Any]]:
+    return table.reset_index().to_dict(orient="records")
+
+
+def _solucao_terms(df: pd.DataFrame) -> pd.Series:
+    """Frases normalizadas da coluna solucao, uma vez por linha (índice = posição)."""
+    terms = (
+        df["solucao"].reset_index(drop=True).str.upper().str.split(r"[.\n;]+").explode()
+        .str.replace(r"\s+", " ", regex=True).str.strip(" ,-:")
+    )
+    terms = terms[terms.str.len() > 3]
+    # A primeira frase costuma repetir o sintoma (descricao), não a causa
+    symptom = terms.str.contains(_SYMPTOM_RE, regex=True)
+    filler = terms.str.contains(_FILLER_RE, regex=True)
+    terms = terms[~(symptom | filler)].astype(str).rename("termo")
+    pairs = terms.reset_index().drop_duplicates()
+    return pairs.set_index(pairs.columns[0])["termo"]
+
+
+def _inverted_index(descricao: pd.Series) -> Dict[str, np.ndarray]:
+    """Termo (unigrama ou bigrama) da descricao -> posições das linhas."""
+    tokens = descricao.reset_index(drop=True).fillna("").astype(str).map(tokenize)
+    unigrams = tokens.explode().dropna()
+    following = tokens.map(bigrams).explode().dropna()
+    terms = pd.concat([unigrams, following])
+    frame = pd.DataFrame({"termo": terms.to_numpy(), "linha": terms.index.to_numpy()}).drop_duplicates()
+    return {
+        term: rows.to_numpy(dtype=np.int64)
+        for term, rows in frame.groupby("termo", sort=False)["linha"]
+    }
+
+
+@dataclass(frozen=True)
+class AggregateTables:
+    rankings: Dict[str, List[Dict[str, Any]]]
+    causes_by_subsistema: Dict[str, pd.Series]
+    causes_by_pattern: Dict[str, List[Dict[str, Any]]]
+    solucao_terms: pd.Series
+    token_index: Dict[str, np.ndarray]
+    sorted_tokens: List[str]
+
+    def top(self, dimension: str, n: int = 10) -> List[Dict[str, Any]]:
+        return self.rankings[dimension][:n]
+
+    def rows_for(self, term: str, prefix: bool = False) -> np.ndarray:
+        term = normalize_upper(term)
+        if not prefix:
+            return self.token_index.get(term, np.empty(0, dtype=np.int64))
+        start = bisect.bisect_left(self.sorted_tokens, term)
+        matches = []
+        for token in self.sorted_tokens[start:]:
+            if not token.startswith(term):
+                break
+            matches.append(self.token_index[token])
+        return np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+
+    def rows_matching(self, alternatives: Iterable[Tuple[str, bool]]) -> np.ndarray:
+        parts = [self.rows_for(term, prefix) for term, prefix in alternatives]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def causes_for_rows(self, rows: np.ndarray, n: Optional[int] = 10) -> List[Dict[str, Any]]:
+        counts = self.solucao_terms[self.solucao_terms.index.isin(rows)].value_counts()
+        table = _counts_table(counts, "causa")
+        return _records(table if n is None else table.head(n))
+
+    def causes_for_subsystems(self, names: Iterable[str], n: int = 10) -> List[Dict[str, Any]]:
+        parts = [self.causes_by_subsistema[name] for name in names if name in self.causes_by_subsistema]
+        if not parts:
+            return []
+        counts = parts[0] if len(parts) == 1 else pd.concat(parts).groupby(level=0).sum()
+        return _records(_counts_table(counts, "causa").head(n))
+
+    def causes_for_pattern(self, pattern: str, n: int = 10) -> List[Dict[str, Any]]:
+        return self.causes_by_pattern[pattern][:n]
+
+
+def top_for_rows(df: pd.DataFrame, dimension: str, rows: np.ndarray, n: Optional[int] = 10) -> List[Dict[str, Any]]:
+    """Ranking de `dimension` só entre as linhas (posições) indicadas."""
+    counts = df[dimension].iloc[rows].value_counts(dropna=True)
+    table = _counts_table(counts, dimension)
+    return _records(table if n is None else table.head(n))
+
+
+def build_aggregates(snapshot: DatasetSnapshot) -> AggregateTables:
+    df = snapshot.df
+    rankings = {
+        dim: _records(_counts_table(df[dim].value_counts(dropna=True), dim))
+        for dim in DIMENSIONS if dim in df.columns
+    }
+
+    terms = _solucao_terms(df) if "solucao" in df.columns else pd.Series(dtype=str, name="termo")
+    token_index = _inverted_index(df["descricao"]) if "descricao" in df.columns else {}
+    sorted_tokens = sorted(token_index)
+
+    causes_by_subsistema: Dict[str, pd.Series] = {}
+    if "subsistema" in df.columns and len(terms):
+        subsistema = df["subsistema"].astype(str).to_numpy()[terms.index.to_numpy()]
+        grouped = pd.DataFrame({"subsistema": subsistema, "termo": terms.to_numpy()})
+        for name, group in grouped.groupby("subsistema", sort=False)["termo"]:
+            causes_by_subsistema[name] = group.value_counts()
+
+    tables = AggregateTables(
+        rankings=rankings,
+        causes_by_subsistema=causes_by_subsistema,
+        causes_by_pattern={},
+        solucao_terms=terms,
+        token_index=token_index,
+        sorted_tokens=sorted_tokens,
+    )
+    for key, alternatives in PATTERNS.items():
+        tables.causes_by_pattern[key] = tables.causes_for_rows(tables.rows_matching(alternatives), n=None)
+    return tables
+
+
+def get_aggregates(snapshot: DatasetSnapshot) -> AggregateTables:
+    """Agregados calculados uma vez por versão do dataset."""
+    return snapshot.memo("aggregates", build_aggregates)
+
+
+def subsystems_matching(snapshot: DatasetSnapshot, code: str) -> List[str]:
+    """Subsistemas cuja sigla contém o código (ignorando espaços)."""
+    names = snapshot.df["subsistema"].cat.categories.astype(str)
+    return [name for name in names if code in name.replace(" ", "")]
+
+
+def subsystems_in(text: str, snapshot: DatasetSnapshot) -> Optional[List[str]]:
+    """Subsistemas citados na pergunta pela sigla, ou None se nenhum casar."""
+    if "subsistema" not in snapshot.df.columns:
+        return None
+    names: List[str] = []
+    for code in dict.fromkeys(c.upper() for c in SUBSYSTEM_CODE_RE.findall(text)):
+        names.extend(n for n in subsystems_matching(snapshot, code) if n not in names)
+    return names or None
+
+
+def pattern_for(text: str) -> Optional[str]:
+    """Identifica na pergunta um dos padrões de PATTERNS."""
+    q = normalize_upper(text)
+    if re.search(r"\bF\.?\s?O\b|FALSA OCUPAC", q):
+        return "falsa-ocupacao"
+    if re.search(r"\bCOD(?:IGO)?\.? ?(?:0|ZERO)\b", q):
+        return "codigo-zero"
+    return None
@@ -0,0 +1,132 @@
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+# Siglas e números (SINCDVCAV, CDV 161, 2023...) precisam coincidir para um
+# acerto por similaridade: "MTTF do SINCDVCAV" e "MTTF do SINCDVFLO" ficam
+# muito próximos no espaço de embeddings, mas têm respostas diferentes.
+_CODE_RE = re.compile(r"\b(?:sinc\w+|\w*\d\w*)\b")
+
+
+def normalize_question(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.strip().lower())
+    text = text.encode("ascii", "ignore").decode("utf-8")
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.")
+
+
+def _codes(normalized: str) -> FrozenSet[str]:
+    return frozenset(_CODE_RE.findall(normalized))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    vector: Optional[np.ndarray]
+    codes: FrozenSet[str]
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """Cache LRU/TTL de respostas do agente. Acerta por texto normalizado
+    ou por similaridade de cosseno do embedding da pergunta. Todo o
+    conteúdo é descartado quando a geração (dataset + índice) muda."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600, threshold: float = 0.95) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._generation: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _sync_generation(self, generation: Hashable) -> None:
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [k for k, e in self._entries.items() if e.expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+
+    def get_exact(self, text: str, generation: Hashable) -> Optional[Any]:
+        key = normalize_question(text)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= now:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def get_similar(self, text: str, vector: Sequence[float], generation: Hashable) -> Optional[Any]:
+        codes = _codes(normalize_question(text))
+        query = _unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            self._sync_generation(generation)
+            self._evict_expired(now)
+            keys: List[str] = []
+            vectors: List[np.ndarray] = []
+            for key, entry in self._entries.items():
+                if entry.vector is not None and entry.codes == codes:
+                    keys.append(key)
+                    vectors.append(entry.vector)
+            if vectors:
+                scores = np.stack(vectors) @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self._entries[keys[best]].value
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: Optional[Sequence[float]], generation: Hashable, value: Any) -> None:
+        key = normalize_question(text)
+        entry = _Entry(
+            value=value,
+            vector=_unit(vector) if vector is not None else None,
+            codes=_codes(key),
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        with self._lock:
+            self._sync_generation(generation)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "invalidations": self.invalidations,
+            }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
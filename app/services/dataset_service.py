@@ -0,0 +1,300 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.utils.instrumentation import span
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+DATA_FILE = BASE_DIR / "data" / "dados.xlsx"
+
+# Colunas de baixa cardinalidade viram categorias (códigos inteiros + dicionário)
+CATEGORICAL_COLS = ["subsistema", "local", "prioridade", "reclamante"]
+TEXT_COLS = ["descricao", "solucao"]
+
+
+# ------------------------------
+# Helpers de preparação de dados
+# ------------------------------
+def slugify_cols(cols: List[str]) -> List[str]:
+    out = []
+    for c in cols:
+        c = str(c).strip().lower()
+        c = unicodedata.normalize("NFKD", c)
+        c = c.encode("ascii", "ignore").decode("utf-8")
+        c = re.sub(r"[^\w\s]", "", c)
+        c = re.sub(r"\s+", "_", c)
+        out.append(c)
+    return out
+
+
+def clean_df(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Normaliza a planilha e devolve também os instantes de falha e de
+    encerramento (data + hora) como colunas datetime64, montados uma única vez."""
+    df.columns = slugify_cols(list(df.columns))
+
+    for col in ["dt_falha", "dt_enc"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+
+    offsets: Dict[str, pd.Series] = {}
+    for col in ["hr_falha", "hr_enc"]:
+        if col in df.columns:
+            hours = pd.to_datetime(
+                df[col].astype(str).str.strip().str.replace(r"\s+", "", regex=True),
+                format="%H:%M",
+                errors="coerce",
+            )
+            offsets[col] = hours - hours.dt.normalize()
+            df[col] = hours.dt.time
+
+    for col in ["solicitacao", "ordem"]:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("string").astype("category")
+
+    for col in TEXT_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype("string")
+
+    timestamps = pd.DataFrame(index=df.index)
+    for name, dt_col, hr_col in [("falha", "dt_falha", "hr_falha"), ("enc", "dt_enc", "hr_enc")]:
+        if dt_col in df.columns and hr_col in offsets:
+            timestamps[name] = df[dt_col] + offsets[hr_col]
+
+    return df, timestamps
+
+
+def load_and_clean_df(path: Path = DATA_FILE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    logger.info(f"Loading data from {path}")
+    if not path.exists():
+        logger.error(f"Data file not found: {path}")
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+
+    with span("dataset_excel_read"):
+        df = pd.read_excel(path, header=0)
+    logger.info(f"Successfully loaded {len(df)} records from Excel file")
+    with span("dataset_clean"):
+        return clean_df(df)
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# ------------------------------
+# Cache Parquet ao lado da planilha
+# ------------------------------
+# Incrementar sempre que clean_df mudar o formato das colunas
+CACHE_FORMAT = 1
+_TS_PREFIX = "__ts_"
+
+
+def cache_path(path: Path, digest: str) -> Path:
+    return path.with_name(f".{path.stem}.{digest[:16]}.v{CACHE_FORMAT}.parquet")
+
+
+def _restore_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """O Parquet devolve as categorias como object e as horas vazias como
+    None; volta aos tipos que clean_df produz a partir do Excel."""
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(pd.CategoricalDtype(df[col].cat.categories.astype("string")))
+    for col in ["hr_falha", "hr_enc"]:
+        if col in df.columns:
+            df[col] = df[col].astype(object).where(df[col].notna(), pd.NaT)
+    return df
+
+
+def read_cache(path: Path, digest: str) -> Optional[Tuple[pd.DataFrame, pd.DataFrame]]:
+    sidecar = cache_path(path, digest)
+    if not sidecar.exists():
+        return None
+    try:
+        import pyarrow.parquet as pq
+
+        with span("dataset_cache_read"):
+            frame = pq.read_table(sidecar, memory_map=True).to_pandas()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache {sidecar.name}: {e}")
+        return None
+
+    ts_cols = [c for c in frame.columns if c.startswith(_TS_PREFIX)]
+    timestamps = frame[ts_cols].rename(columns=lambda c: c[len(_TS_PREFIX):])
+    logger.info(f"Loaded {len(frame)} records from cache {sidecar.name}")
+    return _restore_dtypes(frame.drop(columns=ts_cols)), timestamps
+
+
+def write_cache(path: Path, digest: str, df: pd.DataFrame, timestamps: pd.DataFrame) -> None:
+    sidecar = cache_path(path, digest)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        frame = pd.concat([df, timestamps.add_prefix(_TS_PREFIX)], axis=1)
+        # Grava num temporário e renomeia: outros workers nunca leem arquivo parcial
+        tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+        pq.write_table(pa.Table.from_pandas(frame), tmp)
+        os.replace(tmp, sidecar)
+    except Exception as e:
+        logger.warning(f"Could not write dataset cache {sidecar.name}: {e}")
+        return
+
+    for stale in path.parent.glob(f".{path.stem}.*.parquet"):
+        if stale != sidecar:
+            stale.unlink(missing_ok=True)
+    logger.info(f"Wrote dataset cache {sidecar.name}")
+
+
+def load_dataset(path: Path = DATA_FILE, digest: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Lê o cache Parquet da versão atual da planilha ou, se não houver,
+    processa o Excel e grava o cache para as próximas cargas."""
+    digest = digest or file_digest(path)
+    cached = read_cache(path, digest)
+    if cached is not None:
+        return cached
+
+    df, timestamps = load_and_clean_df(path)
+    write_cache(path, digest, df, timestamps)
+    return df, timestamps
+
+
+# ------------------------------
+# Snapshot imutável do dataset
+# ------------------------------
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """Versão carregada da planilha. O DataFrame é compartilhado entre
+    requisições e não deve ser alterado in-place."""
+
+    df: pd.DataFrame
+    timestamps: pd.DataFrame
+    version: str
+    mtime: float
+    size: int
+    loaded_at: float
+    _derived: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    def memo(self, key: str, factory: Callable[["DatasetSnapshot"], Any]) -> Any:
+        """Calcula (uma vez por versão) uma visão derivada deste snapshot."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            # Chaves como "reliability:<sigla>" contam todas na mesma etapa
+            with span(f"derive_{key.split(':')[0]}"):
+                value = factory(self)
+            return self._derived.setdefault(key, value)
+
+
+class DatasetService:
+    """Mantém a planilha em memória e recarrega em segundo plano quando o
+    arquivo muda (mtime/tamanho e, em seguida, hash do conteúdo)."""
+
+    def __init__(self, path: Path = DATA_FILE, check_interval: float = 5.0) -> None:
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+
+    def _stat(self) -> Tuple[float, int]:
+        st = os.stat(self.path)
+        return st.st_mtime, st.st_size
+
+    def _build_snapshot(self, digest: Optional[str] = None) -> DatasetSnapshot:
+        mtime, size = self._stat()
+        digest = digest or file_digest(self.path)
+        df, timestamps = load_dataset(self.path, digest)
+        return DatasetSnapshot(
+            df=df,
+            timestamps=timestamps,
+            version=digest,
+            mtime=mtime,
+            size=size,
+            loaded_at=time.time(),
+        )
+
+    def snapshot(self) -> DatasetSnapshot:
+        current = self._snapshot
+        if current is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._build_snapshot()
+                    self._last_check = time.monotonic()
+                    logger.info(f"Dataset loaded (version {self._snapshot.version[:12]})")
+                return self._snapshot
+
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._maybe_reload(current)
+        return current
+
+    def _maybe_reload(self, current: DatasetSnapshot) -> None:
+        try:
+            mtime, size = self._stat()
+        except OSError as e:
+            logger.error(f"Could not stat data file: {e}")
+            return
+        if (mtime, size) == (current.mtime, current.size):
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="dataset-reload", daemon=True).start()
+
+    def _reload(self) -> None:
+        try:
+            current = self._snapshot
+            digest = file_digest(self.path)
+            if current is not None and digest == current.version:
+                # Só o mtime mudou (ex.: touch/cópia): mantém os dados atuais
+                mtime, size = self._stat()
+                self._snapshot = DatasetSnapshot(
+                    df=current.df,
+                    timestamps=current.timestamps,
+                    version=current.version,
+                    mtime=mtime,
+                    size=size,
+                    loaded_at=current.loaded_at,
+                    _derived=current._derived,
+                )
+                return
+
+            new = self._build_snapshot(digest)
+            self._snapshot = new
+            logger.info(f"Dataset reloaded (version {new.version[:12]}, {len(new.df)} rows)")
+        except Exception as e:
+            logger.error(f"Error reloading dataset, keeping previous version: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Versão em memória, sem forçar a carga da planilha."""
+        current = self._snapshot
+        return {
+            "dataset_rows": len(current.df) if current is not None else None,
+            "dataset_loaded_timestamp_seconds": current.loaded_at if current is not None else None,
+            "dataset_reloading": float(self._reloading),
+        }
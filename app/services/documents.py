@@ -0,0 +1,122 @@
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+BATCH_SIZE = 512
+
+# Campos que entram no texto embedado, nesta ordem. Identificadores como
+# solicitacao/ordem não ajudam a busca e só gastam tokens.
+DEFAULT_COLUMNS = [
+    "subsistema",
+    "local",
+    "prioridade",
+    "dt_falha",
+    "hr_falha",
+    "dt_enc",
+    "hr_enc",
+    "descricao",
+    "solucao",
+    "reclamante",
+]
+HOUR_COLUMNS = {"hr_falha", "hr_enc"}
+# Metadados tipados de cada documento, usados como filtro antes da busca
+# vetorial; dt_falha vai em segundos desde 1970 (UTC)
+METADATA_COLUMNS = ["subsistema", "local", "prioridade", "dt_falha", "reclamante"]
+
+
+def document_columns() -> List[str]:
+    configured = os.getenv("DOCUMENT_COLUMNS")
+    if not configured:
+        return DEFAULT_COLUMNS
+    return [c.strip() for c in configured.split(",") if c.strip()]
+
+
+def _format_column(name: str, values: pd.Series) -> pd.Series:
+    """Texto de cada célula como `string`, com <NA> onde não há valor."""
+    if name in HOUR_COLUMNS:
+        # datetime.time -> "HH:MM"
+        out = values.where(values.notna()).astype("string").str.slice(0, 5)
+    elif pd.api.types.is_datetime64_any_dtype(values):
+        out = values.dt.strftime("%Y-%m-%d")
+    elif pd.api.types.is_numeric_dtype(values):
+        out = values.astype("Int64").astype("string")
+    else:
+        out = values.astype("string").str.replace(r"\s+", " ", regex=True).str.strip()
+    out = out.astype("string")
+    return out.mask(out.eq("") | out.eq("NaT"))
+
+
+def build_texts(df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.Series:
+    """Monta "col: valor | col: valor" coluna a coluna, pulando células vazias."""
+    columns = [c for c in (columns or document_columns()) if c in df.columns]
+    text = pd.Series(pd.NA, index=df.index, dtype="string")
+    for col in columns:
+        part = f"{col}: " + _format_column(col, df[col])
+        text = (text + " | " + part).fillna(text).fillna(part)
+    return text.fillna("")
+
+
+def metadata_fields(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Valores dos metadados por coluna: texto (None se vazio) e dt_falha
+    como float em segundos (NaN se vazio)."""
+    fields: Dict[str, np.ndarray] = {}
+    for col in METADATA_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            seconds = values.astype("int64").to_numpy() // 10**9
+            fields[col] = np.where(values.isna().to_numpy(), np.nan, seconds.astype(np.float64))
+        else:
+            text = values.astype("string").str.strip()
+            text = text.mask(text.eq(""))
+            fields[col] = text.astype(object).where(text.notna(), None).to_numpy()
+    return fields
+
+
+def _metadata_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    fields = metadata_fields(df)
+    records: List[Dict[str, Any]] = [{} for _ in range(len(df))]
+    for col, values in fields.items():
+        is_time = values.dtype == np.float64
+        for record, value in zip(records, values):
+            # O Chroma não aceita None: campos vazios ficam de fora
+            if value is None or (is_time and np.isnan(value)):
+                continue
+            record[col] = int(value) if is_time else value
+    return records
+
+
+def row_keys(df: pd.DataFrame) -> pd.Series:
+    """Chave de negócio de cada linha (solicitacao-ordem), desambiguada
+    pela ordem de ocorrência quando se repete."""
+    parts = []
+    for col in ["solicitacao", "ordem"]:
+        if col in df.columns:
+            parts.append(df[col].astype("Int64").astype("string").fillna("na"))
+    if parts:
+        key = parts[0].str.cat(parts[1:], sep="-") if len(parts) > 1 else parts[0]
+    else:
+        key = pd.Series("row", index=df.index, dtype="string")
+    occurrence = key.groupby(key).cumcount().astype("string")
+    return key.str.cat(occurrence, sep="#")
+
+
+def iter_document_batches(
+    df: pd.DataFrame, columns: Optional[List[str]] = None, batch_size: int = BATCH_SIZE
+) -> Iterator[List[Document]]:
+    """Gera os documentos em lotes, já com ID estável (chave + hash do texto)."""
+    columns = columns or document_columns()
+    keys = row_keys(df)
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        texts = build_texts(chunk, columns)
+        digests = pd.util.hash_pandas_object(texts, index=False).map("{:016x}".format)
+        ids = keys.iloc[start:start + batch_size] + ":" + digests
+        yield [
+            Document(id=doc_id, page_content=text, metadata={**meta, "row_index": int(idx), "doc_id": doc_id})
+            for idx, text, doc_id, meta in zip(chunk.index, texts, ids, _metadata_records(chunk))
+        ]
@@ -0,0 +1,163 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+
+DEFAULT_MODELS = {
+    # embedding mais lento
+    "huggingface": "BAAI/bge-m3",
+    # embedding mais rápido (ONNX, sem torch)
+    "fastembed": "BAAI/bge-small-en-v1.5",
+}
+
+
+def create_embedder(backend: str, model: str, batch_size: int) -> Embeddings:
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model, encode_kwargs={"batch_size": batch_size})
+    if backend == "fastembed":
+        from langchain_community.embeddings import FastEmbedEmbeddings
+
+        return FastEmbedEmbeddings(model_name=model, batch_size=batch_size)
+    raise ValueError(f"EMBEDDING_BACKEND inválido: {backend!r} (use 'huggingface' ou 'fastembed')")
+
+
+# Estado de cada processo do pool: o modelo é carregado uma vez por worker
+_worker_embedder: Optional[Embeddings] = None
+
+
+def _init_worker(backend: str, model: str, batch_size: int) -> None:
+    global _worker_embedder
+    _worker_embedder = create_embedder(backend, model, batch_size)
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _worker_embedder.embed_documents(texts)
+
+
+class EmbeddingPipeline(Embeddings):
+    """Embeddings com cache em disco (chave = hash do texto + modelo), lotes
+    de tamanho fixo e um pool de processos para os lotes da indexação.
+
+    O pool é criado na primeira chamada com pelo menos `parallel_threshold`
+    textos a calcular (padrão: um lote por worker) e fica vivo até close(),
+    para cada worker carregar o modelo uma única vez."""
+
+    def __init__(
+        self,
+        backend: str,
+        model: str,
+        batch_size: int = 32,
+        workers: int = 1,
+        cache_dir: Optional[Path] = None,
+        parallel_threshold: Optional[int] = None,
+    ) -> None:
+        from langchain.storage import LocalFileStore
+
+        self.backend = backend
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold if parallel_threshold is not None else batch_size * workers
+        self.embedder = create_embedder(backend, model, batch_size)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.store = LocalFileStore(cache_dir) if cache_dir else None
+        self._namespace = f"{backend}:{model}\n".encode("utf-8")
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^a-z0-9]+", "-", f"{self.backend}-{self.model}".lower()).strip("-")
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(self._namespace + text.encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t) for t in texts]
+        vectors: Dict[str, List[float]] = {}
+
+        unique = dict(zip(keys, texts))
+        if self.store is not None:
+            for key, raw in zip(unique, self.store.mget(list(unique))):
+                if raw is not None:
+                    vectors[key] = np.frombuffer(raw, dtype=np.float32).tolist()
+
+        missing = [key for key in unique if key not in vectors]
+        if missing:
+            logger.info(
+                f"Embedding {len(missing)} texts ({len(unique) - len(missing)} cached, "
+                f"{len(texts) - len(unique)} duplicated)"
+            )
+            computed = self._compute([unique[key] for key in missing])
+            vectors.update(zip(missing, computed))
+            if self.store is not None:
+                self.store.mset(
+                    [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in zip(missing, computed)]
+                )
+
+        return [vectors[key] for key in keys]
+
+    def _compute(self, texts: List[str]) -> List[List[float]]:
+        if self.workers <= 1 or len(texts) < self.parallel_threshold:
+            out: List[List[float]] = []
+            for i in range(0, len(texts), self.batch_size):
+                out.extend(self.embedder.embed_documents(texts[i:i + self.batch_size]))
+            return out
+
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        logger.info(f"Embedding {len(chunks)} batches across {self.workers} processes")
+        return [vec for batch in self._executor().map(_embed_in_worker, chunks) for vec in batch]
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                logger.info(f"Starting embedding pool with {self.workers} processes")
+                # spawn: torch/onnxruntime não são seguros após fork
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.backend, self.model, self.batch_size),
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """Encerra o pool de processos, se foi criado."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+            logger.info("Embedding pool stopped")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embedder.embed_query(text)
+
+
+def embeddings_from_env() -> EmbeddingPipeline:
+    backend = os.getenv("EMBEDDING_BACKEND", "huggingface").strip().lower()
+    model = os.getenv("EMBEDDING_MODEL") or DEFAULT_MODELS.get(backend, "")
+    cache_dir = os.getenv("EMBEDDING_CACHE_DIR", str(BASE_DIR / "embedding_cache"))
+    threshold = os.getenv("EMBEDDING_PARALLEL_THRESHOLD")
+    logger.info(f"Loading embedding model {model} ({backend})")
+    return EmbeddingPipeline(
+        backend=backend,
+        model=model,
+        batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+        workers=int(os.getenv("EMBEDDING_WORKERS", "1")),
+        cache_dir=Path(cache_dir) if cache_dir else None,
+        parallel_threshold=int(threshold) if threshold else None,
+    )
@@ -0,0 +1,94 @@
+"""Sincronização incremental entre a planilha e o índice Chroma.
+
+Cada linha recebe um ID estável (chave solicitacao/ordem + hash do
+conteúdo, ver documents.py). Na sincronização só são embedados os IDs que
+ainda não estão no índice; IDs que sumiram da planilha são apagados.
+
+Uso offline (com a API parada, pois o Chroma persistido não é compartilhado
+entre processos):
+
+    python -m app.services.indexer
+"""
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Set
+
+from langchain_core.documents import Document
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+BATCH_SIZE = 256
+
+
+@dataclass
+class IndexStats:
+    added: int = 0
+    deleted: int = 0
+    relocated: int = 0
+    unchanged: int = 0
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.deleted or self.relocated)
+
+
+def _batches(items: List, size: int = BATCH_SIZE) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def sync_index(vectordb, batches: Iterable[List[Document]]) -> IndexStats:
+    """Aplica ao índice apenas a diferença para os documentos recebidos em
+    lotes (já com IDs): embeda os novos e apaga os que sumiram."""
+    start = time.perf_counter()
+    stats = IndexStats()
+
+    stored = vectordb.get(include=["metadatas"])
+    stored_meta: Dict[str, dict] = {
+        doc_id: (meta or {}) for doc_id, meta in zip(stored["ids"], stored["metadatas"])
+    }
+    seen: Set[str] = set()
+
+    for batch in batches:
+        seen.update(doc.id for doc in batch)
+        new = [doc for doc in batch if doc.id not in stored_meta]
+        if new:
+            vectordb.add_documents(new, ids=[doc.id for doc in new])
+            stats.added += len(new)
+            logger.info(f"Indexed {stats.added} new documents")
+
+        # Conteúdo igual mas metadados diferentes (linha deslocada na planilha
+        # ou campos novos em METADATA_COLUMNS): só atualiza metadados, sem embedar
+        moved = [
+            doc for doc in batch
+            if doc.id in stored_meta and stored_meta[doc.id] != doc.metadata
+        ]
+        if moved:
+            vectordb._collection.update(
+                ids=[doc.id for doc in moved], metadatas=[doc.metadata for doc in moved]
+            )
+            stats.relocated += len(moved)
+        stats.unchanged += len(batch) - len(new) - len(moved)
+
+    stale = [doc_id for doc_id in stored_meta if doc_id not in seen]
+    for batch in _batches(stale):
+        vectordb.delete(ids=batch)
+    stats.deleted = len(stale)
+
+    stats.seconds = round(time.perf_counter() - start, 3)
+    return stats
+
+
+if __name__ == "__main__":
+    from app.services.agent_service import AgentService
+    from app.services.dataset_service import DatasetService
+
+    service = AgentService(DatasetService())
+    try:
+        result = service.sync_index()
+    finally:
+        service.close()
+    print(asdict(result))
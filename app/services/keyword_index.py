@@ -0,0 +1,104 @@
+"""Índice de palavras-chave (BM25) em memória sobre os mesmos documentos
+do Chroma, e fusão por posição (RRF) com os resultados da busca vetorial.
+
+A busca densa sozinha tende a perder siglas e códigos exatos (SINCDVCAV,
+F.O, COD 0); o BM25 os encontra por casamento literal de tokens.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+from app.services.dataset_service import DatasetSnapshot
+from app.services.documents import iter_document_batches, metadata_fields
+from app.services.search_filters import SearchFilters
+from app.utils.text import tokenize
+
+# Parâmetros usuais do BM25 (Okapi)
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Constante da Reciprocal Rank Fusion: 1 / (RRF_K + posição)
+RRF_K = 60
+
+
+def keyword_terms(text: str) -> List[str]:
+    """Tokens do texto; siglas com ponto também entram sem ele (F.O -> FO)."""
+    tokens = tokenize(text)
+    return tokens + [t.replace(".", "") for t in tokens if "." in t]
+
+
+@dataclass(frozen=True)
+class KeywordIndex:
+    documents: List[Document]
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]]
+    idf: Dict[str, float]
+    norm: np.ndarray
+    # Metadados por documento (mesma ordem), para aplicar SearchFilters
+    fields: Dict[str, np.ndarray]
+
+    def search(
+        self, text: str, k: int, filters: Optional[SearchFilters] = None
+    ) -> List[Tuple[Document, float]]:
+        scores = np.zeros(len(self.documents), dtype=np.float64)
+        for term in set(keyword_terms(text)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tf = posting
+            scores[docs] += self.idf[term] * tf * (BM25_K1 + 1) / (tf + self.norm[docs])
+
+        keep = filters.mask(self.fields) if filters is not None else None
+        if keep is not None:
+            scores[~keep] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.documents[i], float(scores[i])) for i in ranked]
+
+
+def build_keyword_index(snapshot: DatasetSnapshot) -> KeywordIndex:
+    documents = [doc for batch in iter_document_batches(snapshot.df) for doc in batch]
+    terms = pd.Series([doc.page_content for doc in documents], dtype=object).map(keyword_terms)
+    lengths = terms.map(len).to_numpy(dtype=np.float64)
+    avg_length = lengths.mean() if len(lengths) else 0.0
+
+    exploded = terms.explode().dropna()
+    frame = pd.DataFrame({"term": exploded.to_numpy(), "doc": exploded.index.to_numpy()})
+    tf = frame.groupby(["term", "doc"], sort=False).size()
+
+    postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    idf: Dict[str, float] = {}
+    total = len(documents)
+    for term, group in tf.groupby(level=0, sort=False):
+        docs = group.index.get_level_values(1).to_numpy(dtype=np.int64)
+        postings[term] = (docs, group.to_numpy(dtype=np.float64))
+        idf[term] = float(np.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5)))
+
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length) if avg_length else lengths
+    return KeywordIndex(
+        documents=documents, postings=postings, idf=idf, norm=norm, fields=metadata_fields(snapshot.df)
+    )
+
+
+def get_keyword_index(snapshot: DatasetSnapshot) -> KeywordIndex:
+    """Índice construído uma vez por versão do dataset."""
+    return snapshot.memo("keyword_index", build_keyword_index)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[List[Tuple[Document, float]]], k: int, rrf_k: int = RRF_K
+) -> List[Tuple[Document, float]]:
+    """Combina listas ordenadas somando 1 / (rrf_k + posição) por doc_id.
+    Independe da escala dos scores de cada busca."""
+    fused: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for position, (doc, _) in enumerate(ranking, 1):
+            key = doc.metadata.get("doc_id") or doc.id
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + position)
+            documents.setdefault(key, doc)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(documents[key], score) for key, score in best]
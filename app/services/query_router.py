@@ -0,0 +1,347 @@
+"""Responde perguntas quantitativas (MTTF, MTTR, disponibilidade, rankings
+e causas recorrentes) direto dos agregados do dataset, sem chamar o LLM.
+
+Cobre as intenções dos exemplos few-shot (EXAMPLES em app/services/prompts.py);
+qualquer outra pergunta (ou pedido de relatório) segue para o RAG.
+"""
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.aggregates import (
+    PATTERN_LABELS, PATTERNS, SUBSYSTEM_CODE_RE, get_aggregates, pattern_for, subsystems_matching, top_for_rows,
+)
+from app.services.answer_cache import normalize_question
+from app.services.dataset_service import DatasetSnapshot
+from app.services.reliability_engine import compute_reliability, get_reliability
+from app.services.reliability_store import ReliabilityStore, window_filters
+from app.services.search_filters import SearchFilters, extract_filters, scope_mask
+
+TOP_N = 10
+
+@dataclass
+class RoutedAnswer:
+    intent: str
+    text: str
+    data: List[Dict[str, Any]] = field(default_factory=list)
+
+
+def _num(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# ------------------------------
+# Agregados (memoizados por versão do dataset)
+# ------------------------------
+def _reliability_for(snapshot: DatasetSnapshot, code: str, scope: SearchFilters) -> Optional[pd.Series]:
+    def build(s: DatasetSnapshot) -> Optional[pd.Series]:
+        mask = s.df["subsistema"].isin(subsystems_matching(s, code)).to_numpy()
+        keep = scope_mask(s, scope)
+        if keep is not None:
+            mask &= keep
+        if not mask.any():
+            return None
+        df = s.df.loc[mask].assign(subsistema=pd.Categorical([code] * int(mask.sum())))
+        table = compute_reliability(df, s.timestamps.loc[mask]).table
+        return table.iloc[0] if len(table) else None
+
+    if scope.empty:
+        return snapshot.memo(f"reliability:{code}", build)
+    return build(snapshot)
+
+
+# ------------------------------
+# Recorte (período, local, prioridade, subsistemas)
+# ------------------------------
+_MONTHS = r"janeiro|fevereiro|marco|abril|maio|junho|julho|agosto|setembro|outubro|novembro|dezembro"
+_RELATIVE_RE = re.compile(r"\bultim[oa]s (\d+) (dias?|semanas?|mes(?:es)?|anos?)\b")
+_DAYS_PER_UNIT = {"dia": 1, "semana": 7, "mes": 30, "ano": 365}
+# Referências de tempo ou lugar que extract_filters não converte em filtro:
+# respondê-las com o histórico inteiro daria um número errado
+_UNSUPPORTED_SCOPE_RE = re.compile(
+    r"\b(?:hoje|ontem|recentes?|recentemente|atualmente|semana|trimestre|semestre"
+    r"|(?:este|esse|neste|nesse|ultimo|ultima|passado|passada) (?:ano|mes|dia|periodo)"
+    r"|(?:ano|mes|dia) passado|desde|a partir d[eo]|antes d[eo]|depois d[eo]|apos|ate (?:o |a )?(?:ano |dia )?\d"
+    rf"|{_MONTHS})\b|\d{{1,2}}/\d{{1,2}}|\b(?:19|20)\d{{2}}\b|\b(?:estacao|trecho|patio|prioridade)\b"
+)
+
+
+_PLACE_PREFIX_RE = re.compile(r"^(?:estacao|trecho|patio|prolongamento)(?: d[aeo])?(?: patio d[eo])? ")
+
+
+def _place_names(snapshot: DatasetSnapshot) -> List[str]:
+    """Nomes de estação dentro dos locais ("trecho recife - joana bezerra"
+    -> "recife", "joana bezerra"), para notar locais citados pela metade."""
+    def build(s: DatasetSnapshot) -> List[str]:
+        if "local" not in s.df.columns:
+            return []
+        names = set()
+        for local in s.df["local"].cat.categories.astype(str):
+            for part in normalize_question(local).split("-"):
+                name = _PLACE_PREFIX_RE.sub("", part.strip())
+                if len(name) > 3:
+                    names.add(name)
+        return sorted(names, key=len, reverse=True)
+
+    return snapshot.memo("place_names", build)
+
+
+def _relative_window(q: str) -> Optional[SearchFilters]:
+    """"últimos N dias/semanas/meses/anos" até hoje, como ?ultimos_dias= em /metrics."""
+    match = _RELATIVE_RE.search(q)
+    if match is None:
+        return None
+    unit = match.group(2).rstrip("s").replace("mese", "mes")
+    return window_filters(ultimos_dias=int(match.group(1)) * _DAYS_PER_UNIT[unit])
+
+
+def _question_scope(text: str, q: str, snapshot: DatasetSnapshot, filters: SearchFilters) -> Optional[SearchFilters]:
+    """Recorte da pergunta combinado com o da requisição (que tem prioridade),
+    ou None se a pergunta cita período, local ou prioridade não reconhecidos."""
+    scope = filters.merge(extract_filters(text, snapshot))
+    relative = _relative_window(q)
+    if relative is not None:
+        scope = scope.merge(relative)
+    # Retira o que já virou filtro; sobrando referência de escopo, a
+    # pergunta vai ao RAG em vez de receber um número sem o recorte
+    rest = _RELATIVE_RE.sub(" ", q)
+    if scope.data_inicio or scope.data_fim:
+        rest = re.sub(r"\b(?:19|20)\d{2}\b", " ", rest)
+    if scope.local:
+        rest = re.sub(rf"\b{re.escape(normalize_question(scope.local))}\b", " ", rest)
+    if scope.prioridade:
+        rest = re.sub(r"\bprioridade\b", " ", rest)
+    if _UNSUPPORTED_SCOPE_RE.search(rest):
+        return None
+    if any(re.search(rf"\b{re.escape(name)}\b", rest) for name in _place_names(snapshot)):
+        return None
+    return scope
+
+
+def _scope_rows(snapshot: DatasetSnapshot, scope: SearchFilters) -> Optional[np.ndarray]:
+    keep = scope_mask(snapshot, scope)
+    return None if keep is None else np.flatnonzero(keep)
+
+
+def _scope_label(scope: SearchFilters) -> str:
+    parts = []
+    inicio, fim = scope.data_inicio, scope.data_fim
+    if inicio and fim:
+        parts.append(f"o período de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}")
+    elif inicio:
+        parts.append(f"as falhas a partir de {inicio:%d/%m/%Y}")
+    elif fim:
+        parts.append(f"as falhas até {fim:%d/%m/%Y}")
+    if scope.local:
+        parts.append(f"o local {scope.local}")
+    if scope.prioridade:
+        parts.append(f"a prioridade {scope.prioridade}")
+    if scope.subsistemas:
+        parts.append(f"os subsistemas {', '.join(scope.subsistemas)}")
+    return ", ".join(parts)
+
+
+def _scoped(answer: Optional[RoutedAnswer], scope: SearchFilters, intent: str) -> Optional[RoutedAnswer]:
+    """Prefixa a resposta com o recorte aplicado; sem dados no recorte,
+    diz isso em vez de deixar o LLM responder com o histórico inteiro."""
+    if scope.empty:
+        return answer
+    if answer is None:
+        return RoutedAnswer(intent=intent, text=f"Não há falhas registradas considerando {_scope_label(scope)}.")
+    return replace(answer, text=f"Considerando {_scope_label(scope)}: {answer.text[0].lower()}{answer.text[1:]}")
+
+
+# ------------------------------
+# Intenções
+# ------------------------------
+# coluna no relatório, rótulo com artigo, descrição
+_METRICS = {
+    "mttf": ("mttf_dias", "o MTTF", "tempo médio entre falhas"),
+    "mttr": ("mttr_horas", "o MTTR", "tempo médio de reparo"),
+    "disponibilidade": ("disponibilidade", "a disponibilidade", "disponibilidade"),
+}
+
+
+def _metric_of(q: str) -> Optional[str]:
+    if re.search(r"\bmttf\b|tempo medio (?:ate|entre) (?:a )?falhas?", q):
+        return "mttf"
+    if re.search(r"\bmttr\b|tempo medio (?:de |ate o )?(?:reparo|recuperacao|conserto)", q):
+        return "mttr"
+    if "disponibilidade" in q:
+        return "disponibilidade"
+    return None
+
+
+def _extreme_of(q: str) -> Optional[str]:
+    if re.search(r"\b(?:menor|menores|pior|piores|mais baix[oa])\b", q):
+        return "min"
+    if re.search(r"\b(?:maior|maiores|melhor|melhores|mais alt[oa])\b", q):
+        return "max"
+    return None
+
+
+def _format_metric(metric: str, value: float) -> str:
+    if metric == "mttf":
+        return f"{_num(value * 24)} horas ({_num(value)} dias)"
+    if metric == "mttr":
+        return f"{_num(value)} horas"
+    return f"{_num(value)}%"
+
+
+def _answer_metric(snapshot: DatasetSnapshot, metric: str, code: str, scope: SearchFilters) -> Optional[RoutedAnswer]:
+    column, label, _ = _METRICS[metric]
+    row = _reliability_for(snapshot, code, scope)
+    if row is None or pd.isna(row[column]):
+        return None
+    text = f"{label[0].upper() + label[1:]} do subsistema {code} é de aproximadamente {_format_metric(metric, row[column])}."
+    data = [{"subsistema": code, column: round(float(row[column]), 2)}]
+    return RoutedAnswer(intent=metric, text=text, data=data)
+
+
+def _answer_metric_ranking(
+    snapshot: DatasetSnapshot, metric: str, extreme: str, scope: SearchFilters, store: ReliabilityStore
+) -> Optional[RoutedAnswer]:
+    column, label, description = _METRICS[metric]
+    # Com recorte: combinação das partições mensais, como em /metrics
+    report = get_reliability(snapshot) if scope.empty else store.report(snapshot, scope)
+    table = report.table[column].dropna()
+    if table.empty:
+        return None
+    top = table.sort_values(ascending=(extreme == "min")).head(TOP_N)
+    adjective = "maior" if extreme == "max" else "menor"
+    article, name_only = label.split(" ", 1)
+    lines = [f"{i}. {name}: {_format_metric(metric, value)}" for i, (name, value) in enumerate(top.items(), 1)]
+    text = (
+        f"O subsistema que apresenta {article} {adjective} {name_only} é o {top.index[0]}, "
+        f"com {description} de aproximadamente {_format_metric(metric, top.iloc[0])}.\n"
+        f"Os {len(top)} subsistemas com {adjective} {name_only}:\n" + "\n".join(lines)
+    )
+    data = [{"subsistema": name, column: round(float(value), 2)} for name, value in top.items()]
+    return RoutedAnswer(intent=f"{metric}_{extreme}", text=text, data=data)
+
+
+def _answer_top(
+    snapshot: DatasetSnapshot, column: str, intro: str, intent: str, scope: SearchFilters
+) -> Optional[RoutedAnswer]:
+    rows = _scope_rows(snapshot, scope)
+    if rows is None:
+        ranking = get_aggregates(snapshot).top(column, TOP_N)
+    else:
+        ranking = top_for_rows(snapshot.df, column, rows, TOP_N)
+    if not ranking:
+        return None
+    first = ranking[0]
+    lines = [
+        f"{i}. {row[column]}: {row['quantidade']} ({_num(row['percentual'])}%)"
+        for i, row in enumerate(ranking, 1)
+    ]
+    text = intro.format(
+        nome=first[column], quantidade=first["quantidade"], percentual=_num(first["percentual"])
+    ) + f"\nTop {len(ranking)}:\n" + "\n".join(lines)
+    return RoutedAnswer(intent=intent, text=text, data=ranking)
+
+
+def _answer_causes(causes: List[Dict[str, Any]], scope: str, intent: str) -> Optional[RoutedAnswer]:
+    if not causes:
+        return None
+    first = causes[0]
+    lines = [
+        f"{i}. {row['causa']}: {row['quantidade']} ({_num(row['percentual'])}%)"
+        for i, row in enumerate(causes, 1)
+    ]
+    text = (
+        f"A causa mais recorrente registrada para {scope} é {first['causa']}, representando um total de "
+        f"{first['quantidade']} registros - {_num(first['percentual'])}% do total de causas.\n"
+        f"Causas mais recorrentes:\n" + "\n".join(lines)
+    )
+    return RoutedAnswer(intent=intent, text=text, data=causes)
+
+
+def route_question(
+    text: str,
+    snapshot: DatasetSnapshot,
+    filters: Optional[SearchFilters] = None,
+    store: Optional[ReliabilityStore] = None,
+) -> Optional[RoutedAnswer]:
+    """Retorna a resposta calculada ou None quando a pergunta deve ir ao LLM.
+    Período, local e prioridade citados na pergunta ou em `filters` restringem
+    o cálculo; citados de um jeito que não sabemos filtrar, a pergunta vai ao LLM."""
+    q = normalize_question(text)
+    if "relatorio" in q:
+        return None
+    scope = _question_scope(text, q, snapshot, filters or SearchFilters())
+    if scope is None:
+        return None
+    codes = [c.upper() for c in SUBSYSTEM_CODE_RE.findall(text)]
+    code = codes[0] if len(codes) == 1 else None
+    # Recorte além dos subsistemas (que as intenções por sigla já tratam)
+    window = replace(scope, subsistemas=None)
+    df = snapshot.df
+
+    if re.search(r"\bcausas?\b|\bmotivos?\b", q) and "solucao" in df.columns:
+        aggregates = get_aggregates(snapshot)
+        pattern = pattern_for(text)
+        rows = _scope_rows(snapshot, scope)
+        if pattern:
+            label, intent = PATTERN_LABELS[pattern], f"causas_{pattern.replace('-', '_')}"
+            if rows is None:
+                return _answer_causes(aggregates.causes_for_pattern(pattern, TOP_N), label, intent)
+            rows = np.intersect1d(aggregates.rows_matching(PATTERNS[pattern]), rows)
+            causes = aggregates.causes_for_rows(rows, TOP_N)
+            return _scoped(_answer_causes(causes, label, intent), scope, intent)
+        if code:
+            scope_label = f"o subsistema {code}"
+            if window.empty:
+                causes = aggregates.causes_for_subsystems(subsystems_matching(snapshot, code), TOP_N)
+                return _answer_causes(causes, scope_label, "causas_subsistema")
+            causes = aggregates.causes_for_rows(rows, TOP_N)
+            return _scoped(_answer_causes(causes, scope_label, "causas_subsistema"), window, "causas_subsistema")
+        return None
+
+    # Só o ranking de quem mais registrou; outras perguntas sobre
+    # reclamantes ou reclamações vão ao RAG
+    if re.search(r"\breclam[ae]ntes?\b.*\b(?:mais|maior(?:es)?)\b|\bquem mais (?:registrou|reclamou)\b", q):
+        return _scoped(
+            _answer_top(
+                snapshot, "reclamante",
+                "O reclamante que mais registrou falhas foi {nome}, com {quantidade} registros ({percentual}% do total).",
+                "top_reclamantes", scope,
+            ),
+            scope, "top_reclamantes",
+        )
+
+    if re.search(r"\blo(?:cal|cais)\b", q) and re.search(r"\b(?:mais|maior)\b", q):
+        return _scoped(
+            _answer_top(
+                snapshot, "local",
+                "O local com mais falhas registradas é {nome}, representando cerca de {percentual}% "
+                "do total de ocorrências registradas ({quantidade} falhas).",
+                "top_locais", scope,
+            ),
+            scope, "top_locais",
+        )
+
+    metric = _metric_of(q)
+    if metric:
+        if code:
+            return _scoped(_answer_metric(snapshot, metric, code, window), window, metric)
+        extreme = _extreme_of(q)
+        if extreme and "subsistema" in q:
+            store = store or ReliabilityStore()
+            return _scoped(_answer_metric_ranking(snapshot, metric, extreme, scope, store), scope, f"{metric}_{extreme}")
+        return None
+
+    if "subsistema" in q and re.search(r"\bmais falha|\bmaior (?:numero|quantidade) de falhas", q):
+        return _scoped(
+            _answer_top(
+                snapshot, "subsistema",
+                "O subsistema com mais falhas registradas é o {nome}, representando cerca de {percentual}% "
+                "do total de ocorrências ({quantidade} falhas).",
+                "top_subsistemas", scope,
+            ),
+            scope, "top_subsistemas",
+        )
+    return None
@@ -0,0 +1,31 @@
+from typing import Dict, Optional
+
+from app.services.agent_service import AgentService
+from app.services.dataset_service import DatasetService
+from app.services.reliability_store import ReliabilityStore
+from app.services.warmup import Warmup
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ServiceRegistry:
+    """Serviços compartilhados pelo processo, criados uma vez no lifespan
+    da aplicação e entregues aos routers via dependências."""
+
+    def __init__(
+        self, dataset: Optional[DatasetService] = None, agent: Optional[AgentService] = None
+    ) -> None:
+        self.dataset = dataset or DatasetService()
+        self.reliability = agent.reliability if agent is not None else ReliabilityStore()
+        self.agent = agent or AgentService(self.dataset, reliability=self.reliability)
+        self.warmup = Warmup(self)
+        logger.info("Service registry created")
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        warmup = {f"warmup_{name}_ready": float(state.ready) for name, state in self.warmup.steps.items()}
+        return {**self.dataset.stats(), **self.agent.stats(), **warmup}
+
+    def close(self) -> None:
+        self.agent.close()
+        logger.info("Service registry closed")
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.dataset_service import DatasetSnapshot
+
+REQUIRED_COLUMNS = {"subsistema", "dt_falha", "hr_falha", "dt_enc", "hr_enc"}
+
+NAT = np.iinfo(np.int64).min
+NS_PER_HOUR = 3600 * 10**9
+NS_PER_DAY = 24 * NS_PER_HOUR
+
+
+@dataclass(frozen=True)
+class ReliabilityReport:
+    """MTTF (dias), MTTR (horas), disponibilidade (%) e quantidade de falhas
+    por subsistema, indexados pelo nome do subsistema."""
+
+    table: pd.DataFrame
+    disponibilidade_media: Optional[float]
+
+
+def _as_ns(values: pd.Series) -> np.ndarray:
+    return values.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _segment_reduce(ufunc: np.ufunc, codes: np.ndarray, values: np.ndarray, size: int, fill: int) -> np.ndarray:
+    """Aplica `ufunc.reduceat` por segmento de `codes` (ordenados uma vez)."""
+    out = np.full(size, fill, dtype=values.dtype)
+    if len(codes) == 0:
+        return out
+    order = np.argsort(codes, kind="stable")
+    codes, values = codes[order], values[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    out[codes[starts]] = ufunc.reduceat(values, starts)
+    return out
+
+
+def reliability_report(
+    index: pd.Index,
+    quantidade: np.ndarray,
+    n_falha: np.ndarray,
+    primeira: np.ndarray,
+    ultima: np.ndarray,
+    n_reparo: np.ndarray,
+    soma_reparo: np.ndarray,
+) -> ReliabilityReport:
+    """Métricas finais a partir dos agregados de cada grupo (somas,
+    contagens e primeira/última falha em ns), que podem ser combinados
+    entre partições antes desta etapa."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # MTTF: a média dos intervalos entre falhas consecutivas é
+        # (última - primeira) / (n - 1), então basta min/max/contagem por grupo
+        mttf_dias = np.where(
+            n_falha >= 2, (ultima - primeira) / np.maximum(n_falha - 1, 1) / NS_PER_DAY, np.nan
+        )
+        mttr_horas = np.where(n_reparo > 0, soma_reparo / np.maximum(n_reparo, 1), np.nan)
+        mttf_horas = mttf_dias * 24
+        disponibilidade = mttf_horas / (mttf_horas + mttr_horas) * 100
+
+    table = pd.DataFrame(
+        {
+            "quantidade_falhas": quantidade,
+            "mttf_dias": mttf_dias,
+            "mttr_horas": mttr_horas,
+            "disponibilidade": disponibilidade,
+        },
+        index=index,
+    )
+    table = table[table["quantidade_falhas"] > 0]
+
+    disponiveis = table["disponibilidade"].dropna()
+    media = float(disponiveis.mean()) if len(disponiveis) else None
+    return ReliabilityReport(table=table, disponibilidade_media=media)
+
+
+def compute_reliability(df: pd.DataFrame, timestamps: pd.DataFrame) -> ReliabilityReport:
+    subsistema = df["subsistema"]
+    if not isinstance(subsistema.dtype, pd.CategoricalDtype):
+        subsistema = subsistema.astype("category")
+    categories = subsistema.cat.categories
+    size = len(categories)
+    codes = subsistema.cat.codes.to_numpy()
+
+    # MTTF entre datas de falha (dt_falha, sem a hora), como no cálculo
+    # original; MTTR com o instante exato (data + hora)
+    falha = _as_ns(df["dt_falha"])
+    falha_exata = _as_ns(timestamps["falha"])
+    enc = _as_ns(timestamps["enc"])
+
+    valid = codes >= 0
+    quantidade = np.bincount(codes[valid], minlength=size)
+
+    # MTTF: primeira/última falha e contagem por grupo
+    ok = valid & (falha != NAT)
+    c, v = codes[ok], falha[ok]
+    n_falha = np.bincount(c, minlength=size)
+    primeira = _segment_reduce(np.minimum, c, v, size, NAT)
+    ultima = _segment_reduce(np.maximum, c, v, size, NAT)
+
+    # MTTR: média de (encerramento - falha) por registro completo
+    ok = valid & (falha_exata != NAT) & (enc != NAT)
+    c = codes[ok]
+    reparo_horas = (enc[ok] - falha_exata[ok]) / NS_PER_HOUR
+    n_reparo = np.bincount(c, minlength=size)
+    soma_reparo = np.bincount(c, weights=reparo_horas, minlength=size)
+
+    return reliability_report(
+        pd.Index(categories.astype(str), name="subsistema"),
+        quantidade, n_falha, primeira, ultima, n_reparo, soma_reparo,
+    )
+
+
+def get_reliability(snapshot: DatasetSnapshot) -> ReliabilityReport:
+    """Relatório de confiabilidade calculado uma vez por versão do dataset."""
+    return snapshot.memo(
+        "reliability", lambda s: compute_reliability(s.df, s.timestamps)
+    )
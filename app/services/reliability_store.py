@@ -0,0 +1,224 @@
+"""Agregados de confiabilidade particionados por mês, para responder
+MTTF/MTTR/disponibilidade em qualquer janela de datas e recorte
+(subsistema, local, prioridade) sem varrer todas as linhas.
+
+Cada partição guarda, por (subsistema, local, prioridade), somas e
+contagens que podem ser combinadas: quantidade de falhas, primeira e
+última falha, número e soma dos tempos de reparo. Meses inteiros da
+janela vêm das partições; só os meses das bordas são recalculados a partir
+das linhas, filtradas por dia. A cada nova versão da planilha só os meses
+cujo conteúdo mudou (hash das linhas) são reagregados.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.dataset_service import DatasetSnapshot
+from app.services.reliability_engine import (
+    NS_PER_HOUR,
+    ReliabilityReport,
+    _as_ns,
+    _segment_reduce,
+    reliability_report,
+)
+from app.services.search_filters import SearchFilters
+from app.utils.instrumentation import timed
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+GROUP_COLUMNS = ["subsistema", "local", "prioridade"]
+# Maior ultimos_dias aceito pela API (100 anos)
+MAX_ULTIMOS_DIAS = 36500
+# Linhas sem dt_falha: só entram quando não há filtro de datas
+UNDATED = "sem-data"
+
+_SUMS = {"quantidade": "sum", "n_falha": "sum", "primeira": "min", "ultima": "max", "n_reparo": "sum", "soma_reparo": "sum"}
+
+
+def _facts(snapshot: DatasetSnapshot) -> pd.DataFrame:
+    """Uma linha por falha com o necessário para os agregados."""
+    df, ts = snapshot.df, snapshot.timestamps
+    dia = df["dt_falha"]
+    reparo = (ts["enc"] - ts["falha"]).to_numpy(dtype="timedelta64[ns]").view(np.int64)
+    reparo_horas = np.where(ts["enc"].notna() & ts["falha"].notna(), reparo / NS_PER_HOUR, np.nan)
+    month = dia.dt.strftime("%Y-%m").fillna(UNDATED)
+
+    facts = pd.DataFrame(
+        {
+            "month": month.to_numpy(),
+            "dia": dia.to_numpy(),
+            "reparo_horas": reparo_horas,
+        }
+    )
+    for col in GROUP_COLUMNS:
+        values = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        facts[col] = values.astype(object).where(values.notna(), None).to_numpy()
+    return facts[facts["subsistema"].notna()].reset_index(drop=True)
+
+
+def _aggregate(facts: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
+    grouped = facts.groupby(keys, dropna=False, sort=False)
+    return grouped.agg(
+        quantidade=("month", "size"),
+        # MTTF entre datas de falha, como em compute_reliability
+        n_falha=("dia", "count"),
+        primeira=("dia", "min"),
+        ultima=("dia", "max"),
+        n_reparo=("reparo_horas", "count"),
+        soma_reparo=("reparo_horas", "sum"),
+    ).reset_index()
+
+
+def _month_hashes(facts: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """Hash de cada mês independente da ordem das linhas (soma módulo 2^64)."""
+    if facts.empty:
+        return {}
+    rows = pd.util.hash_pandas_object(facts, index=False).to_numpy()
+    codes, months = pd.factorize(facts["month"])
+    sums = _segment_reduce(np.add, codes, rows, len(months), 0)
+    counts = np.bincount(codes, minlength=len(months))
+    return {month: (int(total), int(n)) for month, total, n in zip(months, sums, counts)}
+
+
+@dataclass(frozen=True)
+class _Partitions:
+    version: str
+    facts: pd.DataFrame
+    month_rows: Dict[str, np.ndarray]
+    hashes: Dict[str, Tuple[int, int]]
+    partitions: Dict[str, pd.DataFrame]
+    # Todas as partições juntas, com a coluna month
+    table: pd.DataFrame
+
+
+def _month_bounds(month: str):
+    period = pd.Period(month, freq="M")
+    return period.start_time.date(), period.end_time.date()
+
+
+class ReliabilityStore:
+    """Mantém as partições da última versão da planilha e as atualiza
+    incrementalmente quando uma nova versão chega."""
+
+    def __init__(self) -> None:
+        self._current: Optional[_Partitions] = None
+        self._lock = threading.Lock()
+
+    def _partitions(self, snapshot: DatasetSnapshot) -> _Partitions:
+        return snapshot.memo("reliability_partitions", self._build)
+
+    def _build(self, snapshot: DatasetSnapshot) -> _Partitions:
+        facts = _facts(snapshot)
+        hashes = _month_hashes(facts)
+        month_rows = {m: rows for m, rows in facts.groupby("month", sort=False).indices.items()}
+
+        with self._lock:
+            previous = self._current
+        partitions: Dict[str, pd.DataFrame] = {}
+        changed: List[str] = []
+        for month, digest in hashes.items():
+            if previous is not None and previous.hashes.get(month) == digest:
+                partitions[month] = previous.partitions[month]
+            else:
+                changed.append(month)
+
+        if changed:
+            rows = np.concatenate([month_rows[m] for m in changed])
+            fresh = _aggregate(facts.iloc[rows], ["month", *GROUP_COLUMNS])
+            for month, group in fresh.groupby("month", sort=False):
+                partitions[month] = group.drop(columns="month").reset_index(drop=True)
+
+        frames = [p.assign(month=m) for m, p in partitions.items()]
+        table = pd.concat(frames, ignore_index=True) if frames else _aggregate(facts, ["month", *GROUP_COLUMNS])
+        state = _Partitions(
+            version=snapshot.version,
+            facts=facts,
+            month_rows=month_rows,
+            hashes=hashes,
+            partitions=partitions,
+            table=table,
+        )
+        with self._lock:
+            self._current = state
+        logger.info(
+            f"Reliability partitions for {snapshot.version[:12]}: "
+            f"{len(changed)} of {len(hashes)} months recomputed"
+        )
+        return state
+
+    @timed("reliability_window")
+    def report(
+        self, snapshot: DatasetSnapshot, filters: SearchFilters, group_by: str = "subsistema"
+    ) -> ReliabilityReport:
+        state = self._partitions(snapshot)
+        inicio, fim = filters.data_inicio, filters.data_fim
+        dated = inicio is not None or fim is not None
+
+        full: List[str] = []
+        edges: List[str] = []
+        for month in state.partitions:
+            if month == UNDATED:
+                if not dated:
+                    full.append(month)
+                continue
+            start, end = _month_bounds(month)
+            if (inicio and end < inicio) or (fim and start > fim):
+                continue
+            if (inicio is None or inicio <= start) and (fim is None or end <= fim):
+                full.append(month)
+            else:
+                edges.append(month)
+
+        table = state.table
+        frames = [table[table["month"].isin(full)]]
+        if edges:
+            # Meses parcialmente cobertos: agrega só os dias dentro da janela
+            rows = state.facts.iloc[np.concatenate([state.month_rows[m] for m in edges])]
+            dia = rows["dia"].dt.date
+            keep = np.ones(len(rows), dtype=bool)
+            if inicio is not None:
+                keep &= (dia >= inicio).to_numpy()
+            if fim is not None:
+                keep &= (dia <= fim).to_numpy()
+            frames.append(_aggregate(rows[keep], GROUP_COLUMNS))
+        merged = pd.concat(frames, ignore_index=True)
+
+        if filters.subsistemas:
+            merged = merged[merged["subsistema"].isin(filters.subsistemas)]
+        if filters.local:
+            merged = merged[merged["local"] == filters.local]
+        if filters.prioridade:
+            merged = merged[merged["prioridade"] == filters.prioridade]
+
+        grouped = merged.groupby(group_by, sort=True).agg(_SUMS)
+        return reliability_report(
+            pd.Index(grouped.index.astype(str), name=group_by),
+            grouped["quantidade"].to_numpy(),
+            grouped["n_falha"].to_numpy(),
+            _as_ns(grouped["primeira"]),
+            _as_ns(grouped["ultima"]),
+            grouped["n_reparo"].to_numpy(),
+            grouped["soma_reparo"].to_numpy(),
+        )
+
+
+def window_filters(
+    data_inicio: Optional[date] = None,
+    data_fim: Optional[date] = None,
+    ultimos_dias: Optional[int] = None,
+    **fields,
+) -> SearchFilters:
+    """Janela explícita ou os últimos N dias até hoje."""
+    if ultimos_dias is not None and data_inicio is None:
+        data_fim = data_fim or date.today()
+        try:
+            data_inicio = data_fim - timedelta(days=ultimos_dias - 1)
+        except OverflowError:
+            # Janela maior que o calendário: todo o histórico até data_fim
+            data_inicio = date.min
+    return SearchFilters(data_inicio=data_inicio, data_fim=data_fim, **fields)
@@ -0,0 +1,151 @@
+"""Filtros de busca (subsistema, local, prioridade, período) extraídos da
+pergunta ou informados na requisição, aplicados antes da busca vetorial
+(cláusula `where` do Chroma) e na busca por palavras-chave."""
+import re
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.services.aggregates import subsystems_in, subsystems_matching
+from app.services.answer_cache import normalize_question
+from app.services.dataset_service import DatasetSnapshot
+from app.services.documents import metadata_fields
+
+_YEAR_RANGE_RE = re.compile(r"\bentre (20\d{2}) e (20\d{2})\b")
+_YEAR_RE = re.compile(r"\b(?:em|de|no ano(?: de)?|ano|durante)\s+(20\d{2})\b")
+_PRIORIDADE_RE = re.compile(r"\bprioridade (alta|baixa|media)\b")
+
+
+def to_epoch(day: date) -> int:
+    """Segundos desde 1970 (UTC) da meia-noite do dia, como em dt_falha."""
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    subsistemas: Optional[Tuple[str, ...]] = None
+    local: Optional[str] = None
+    prioridade: Optional[str] = None
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+
+    @property
+    def empty(self) -> bool:
+        return self == SearchFilters()
+
+    def merge(self, other: "SearchFilters") -> "SearchFilters":
+        """Completa os campos vazios com os de `other` (este tem prioridade)."""
+        values = {
+            name: getattr(other, name)
+            for name in self.__dataclass_fields__
+            if getattr(self, name) is None
+        }
+        return replace(self, **values)
+
+    def _bounds(self) -> Tuple[Optional[int], Optional[int]]:
+        start = to_epoch(self.data_inicio) if self.data_inicio else None
+        # data_fim inclusiva: até o início do dia seguinte
+        end = to_epoch(self.data_fim + timedelta(days=1)) if self.data_fim else None
+        return start, end
+
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """Cláusula `where` do Chroma sobre os metadados dos documentos."""
+        clauses = []
+        if self.subsistemas:
+            clauses.append({"subsistema": {"$in": list(self.subsistemas)}})
+        if self.local:
+            clauses.append({"local": self.local})
+        if self.prioridade:
+            clauses.append({"prioridade": self.prioridade})
+        start, end = self._bounds()
+        if start is not None:
+            clauses.append({"dt_falha": {"$gte": start}})
+        if end is not None:
+            clauses.append({"dt_falha": {"$lt": end}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def mask(self, fields: Mapping[str, np.ndarray]) -> Optional[np.ndarray]:
+        """Mesmo filtro sobre colunas em memória (None = sem restrição)."""
+        if self.empty:
+            return None
+        keep = np.ones(len(next(iter(fields.values()))), dtype=bool)
+        if self.subsistemas:
+            keep &= np.isin(fields["subsistema"], list(self.subsistemas))
+        if self.local:
+            keep &= fields["local"] == self.local
+        if self.prioridade:
+            keep &= fields["prioridade"] == self.prioridade
+        start, end = self._bounds()
+        dt_falha = fields["dt_falha"]
+        if start is not None:
+            keep &= dt_falha >= start
+        if end is not None:
+            keep &= dt_falha < end
+        return keep
+
+
+def scope_mask(snapshot: DatasetSnapshot, filters: SearchFilters) -> Optional[np.ndarray]:
+    """Linhas do snapshot dentro do recorte (None = todas)."""
+    return filters.mask(snapshot.memo("metadata_fields", lambda s: metadata_fields(s.df)))
+
+
+def _categories(snapshot: DatasetSnapshot, column: str):
+    if column not in snapshot.df.columns:
+        return []
+    return snapshot.df[column].cat.categories.astype(str)
+
+
+def extract_filters(text: str, snapshot: DatasetSnapshot) -> SearchFilters:
+    """Filtros citados na pergunta: siglas de subsistema, nome completo do
+    local, "prioridade alta/media/baixa" e ano ("em 2023", "entre 2019 e 2021")."""
+    q = normalize_question(text)
+    subsistemas = subsystems_in(text, snapshot)
+
+    local = None
+    for name in sorted(_categories(snapshot, "local"), key=len, reverse=True):
+        if re.search(rf"\b{re.escape(normalize_question(name))}\b", q):
+            local = name
+            break
+
+    prioridade = None
+    match = _PRIORIDADE_RE.search(q)
+    if match:
+        wanted = match.group(1)
+        prioridade = next(
+            (p for p in _categories(snapshot, "prioridade") if normalize_question(p) == wanted), None
+        )
+
+    data_inicio = data_fim = None
+    match = _YEAR_RANGE_RE.search(q) or _YEAR_RE.search(q)
+    if match:
+        first, last = int(match.group(1)), int(match.groups()[-1])
+        data_inicio, data_fim = date(min(first, last), 1, 1), date(max(first, last), 12, 31)
+
+    return SearchFilters(
+        subsistemas=tuple(subsistemas) if subsistemas else None,
+        local=local,
+        prioridade=prioridade,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
+    )
+
+
+def resolve_category(value: str, column: str, snapshot: DatasetSnapshot) -> str:
+    """Valor informado na requisição -> categoria da coluna, comparando sem
+    acentos nem caixa ("estação recife" -> "ESTACAO RECIFE"). ValueError se
+    nenhuma categoria casar."""
+    wanted = normalize_question(value)
+    for name in _categories(snapshot, column):
+        if normalize_question(name) == wanted:
+            return name
+    raise ValueError(f"Valor desconhecido para {column}: {value!r}")
+
+
+def resolve_subsystems(code: str, snapshot: DatasetSnapshot) -> Tuple[str, ...]:
+    """Sigla informada na requisição -> subsistemas que a contêm."""
+    names = subsystems_matching(snapshot, code.upper().replace(" ", ""))
+    return tuple(names) if names else (code.upper(),)
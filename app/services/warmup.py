@@ -0,0 +1,149 @@
+"""Aquecimento em segundo plano no lifespan da aplicação: a planilha e o
+modelo de embeddings carregam em paralelo; as visões de métricas saem da
+planilha e o índice (Chroma, BM25, exemplos few-shot) espera os dois.
+
+Cada etapa marca seu estado ao terminar, para /health/ready e para os
+routers responderem 503 enquanto o que precisam não está pronto. Etapas
+que falham são repetidas a cada WARMUP_RETRY_SECONDS (padrão 30). Etapas
+fora da lista pedida (WARMUP_STEPS no ambiente) contam como prontas e o
+recurso correspondente carrega na primeira requisição que o usar.
+"""
+import asyncio
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Sequence, Tuple
+
+from app.services.aggregates import get_aggregates
+from app.services.reliability_engine import REQUIRED_COLUMNS, get_reliability
+from app.services.search_filters import SearchFilters
+from app.utils.instrumentation import span
+from app.utils.logger_config import setup_logger
+
+if TYPE_CHECKING:
+    from app.services.registry import ServiceRegistry
+
+logger = setup_logger(__name__)
+
+# dataset: /metrics pode responder; index: /agents pode responder
+WARMUP_STEPS = ("dataset", "views", "embeddings", "index")
+# Etapas que precisam terminar antes de cada uma começar
+REQUIRES = {"views": ("dataset",), "index": ("dataset", "embeddings")}
+
+
+@dataclass
+class StepState:
+    ready: bool = False
+    running: bool = False
+    attempts: int = 0
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+def warmup_steps_from_env() -> Tuple[str, ...]:
+    """Etapas em WARMUP_STEPS (separadas por vírgula, ex.: "dataset,views");
+    todas quando a variável não existe."""
+    configured = os.getenv("WARMUP_STEPS")
+    if configured is None:
+        return WARMUP_STEPS
+    steps = tuple(s.strip() for s in configured.split(",") if s.strip())
+    unknown = [s for s in steps if s not in WARMUP_STEPS]
+    if unknown:
+        raise ValueError(f"WARMUP_STEPS inválido: {', '.join(unknown)} (use {', '.join(WARMUP_STEPS)})")
+    return steps
+
+
+class Warmup:
+    """Estado e execução das etapas de aquecimento de um ServiceRegistry."""
+
+    def __init__(self, registry: "ServiceRegistry", retry_seconds: Optional[float] = None) -> None:
+        self.registry = registry
+        self.retry_seconds = (
+            retry_seconds if retry_seconds is not None else float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+        )
+        self.steps: Dict[str, StepState] = {name: StepState() for name in WARMUP_STEPS}
+        self._task: Optional[asyncio.Task] = None
+
+    def ready(self, step: str) -> bool:
+        return self.steps[step].ready
+
+    def error(self, step: str) -> Optional[str]:
+        """Última falha da etapa ou de uma etapa de que ela depende."""
+        for name in (*REQUIRES.get(step, ()), step):
+            if self.steps[name].error:
+                return f"{name}: {self.steps[name].error}"
+        return None
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: asdict(state) for name, state in self.steps.items()}
+
+    def start(self, steps: Sequence[str] = WARMUP_STEPS) -> None:
+        """Agenda as etapas pedidas no event loop atual e retorna em seguida;
+        as demais ficam prontas já, para carregar sob demanda."""
+        for name, state in self.steps.items():
+            if name not in steps:
+                state.ready, state.skipped = True, True
+        self._task = asyncio.get_running_loop().create_task(self._run(set(steps)))
+
+    async def stop(self) -> None:
+        if self._task is None or self._task.done():
+            return
+        # Etapas já em andamento numa thread terminam sozinhas
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self, steps: set) -> None:
+        start = time.perf_counter()
+
+        async def step(name: str, fn: Callable[[], Any]) -> None:
+            if name in steps:
+                await self._step(name, fn)
+
+        agent = self.registry.agent
+        dataset = asyncio.ensure_future(step("dataset", self.registry.dataset.snapshot))
+        embeddings = asyncio.ensure_future(step("embeddings", lambda: agent.embeddings))
+
+        async def views() -> None:
+            await dataset
+            await step("views", self._build_views)
+
+        async def index() -> None:
+            await asyncio.gather(dataset, embeddings)
+            await step("index", agent.warm_retrieval)
+
+        await asyncio.gather(views(), index())
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.1f} s")
+
+    async def _step(self, name: str, fn: Callable[[], Any]) -> None:
+        state = self.steps[name]
+        while True:
+            state.attempts += 1
+            state.running = True
+            start = time.perf_counter()
+            try:
+                with span(f"warmup_{name}"):
+                    await asyncio.to_thread(fn)
+            except Exception as e:
+                state.running, state.error = False, str(e)
+                logger.error(
+                    f"Warm-up step {name} failed (attempt {state.attempts}): {e}; "
+                    f"retrying in {self.retry_seconds:g} s"
+                )
+                await asyncio.sleep(self.retry_seconds)
+                continue
+            state.ready, state.running, state.error = True, False, None
+            state.seconds = round(time.perf_counter() - start, 2)
+            logger.info(f"Warm-up step {name} ready in {state.seconds} s")
+            return
+
+    def _build_views(self) -> None:
+        """Visões das métricas calculadas antes da primeira requisição."""
+        snapshot = self.registry.dataset.snapshot()
+        get_aggregates(snapshot)
+        if REQUIRED_COLUMNS.issubset(snapshot.df.columns):
+            get_reliability(snapshot)
+            self.registry.reliability.report(snapshot, SearchFilters())
@@ -0,0 +1,234 @@
+"""Métricas Prometheus do processo: duração de cada etapa (spans),
+contadores, medidores de cache/índice/concorrência lidos na coleta e um
+profiler opcional por requisição."""
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi import Request
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.utils.logger_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# De ~1 ms (busca no BM25) a dezenas de segundos (Gemini, carga do Excel)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "ferrovia_stage_duration_seconds",
+    "Duração de cada etapa do processamento",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_ERRORS = Counter("ferrovia_stage_errors_total", "Etapas encerradas com exceção", ["stage"])
+HTTP_REQUESTS = Counter(
+    "ferrovia_http_requests_total", "Requisições HTTP atendidas", ["method", "route", "status"]
+)
+HTTP_SECONDS = Histogram(
+    "ferrovia_http_request_duration_seconds",
+    "Duração das requisições HTTP até o envio dos cabeçalhos",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge("ferrovia_http_requests_in_progress", "Requisições HTTP em andamento")
+# source: metrics, cache_exact, cache_semantic ou llm
+ANSWERS = Counter("ferrovia_answers_total", "Respostas do agente por origem", ["source"])
+# kind: input, cached (parte do input vinda do cache do Gemini) ou output
+LLM_TOKENS = Counter("ferrovia_llm_tokens_total", "Tokens consumidos no Gemini", ["kind"])
+
+
+# ------------------------------
+# Spans
+# ------------------------------
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mede um trecho no histograma da etapa e conta as exceções."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Stage {stage} took {elapsed * 1000:.1f} ms",
+                extra={"stage": stage, "duration_ms": round(elapsed * 1000, 3)},
+            )
+
+
+def timed(stage: str) -> Callable:
+    """Versão decorador de `span`, para funções síncronas ou assíncronas."""
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# ------------------------------
+# Medidores lidos na coleta
+# ------------------------------
+class StatsCollector(Collector):
+    """Expõe os valores atuais de `source` (nome -> número), consultada a
+    cada coleta: nomes terminados em _total viram contadores, os demais
+    gauges; valores None são omitidos."""
+
+    def __init__(self, source: Callable[[], Dict[str, Optional[float]]], prefix: str = "ferrovia_") -> None:
+        self.source = source
+        self.prefix = prefix
+
+    def collect(self):
+        try:
+            values = self.source()
+        except Exception as e:
+            logger.warning(f"Could not collect service stats: {e}")
+            return
+        for name, value in values.items():
+            if value is None:
+                continue
+            if name.endswith("_total"):
+                name = name[: -len("_total")]
+                yield CounterMetricFamily(f"{self.prefix}{name}", name.replace("_", " "), value=float(value))
+            else:
+                yield GaugeMetricFamily(f"{self.prefix}{name}", name.replace("_", " "), value=float(value))
+
+
+def register_stats(source: Callable[[], Dict[str, Optional[float]]]) -> StatsCollector:
+    collector = StatsCollector(source)
+    REGISTRY.register(collector)
+    return collector
+
+
+def unregister_stats(collector: StatsCollector) -> None:
+    try:
+        REGISTRY.unregister(collector)
+    except KeyError:
+        pass
+
+
+# ------------------------------
+# Profiler por requisição
+# ------------------------------
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = Path(__file__).resolve().parents[2] / "logs" / "profiles"
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "").lower() in ("1", "true", "yes")
+
+
+class RequestProfiler:
+    """pyinstrument (amostragem, acompanha o código assíncrono), que está
+    em requirements.txt; sem ele, cProfile, que mede tudo o que roda na
+    thread do event loop no período, inclusive outras requisições
+    concorrentes."""
+
+    def __init__(self) -> None:
+        try:
+            from pyinstrument import Profiler
+
+            self._profiler: Any = Profiler(async_mode="enabled")
+            self.kind = "pyinstrument"
+        except ImportError:
+            logger.warning("pyinstrument not installed; falling back to cProfile")
+            self._profiler = cProfile.Profile()
+            self.kind = "cprofile"
+
+    def start(self) -> None:
+        if self.kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self, label: str) -> Path:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label.strip('/').replace('/', '_') or 'root'}"
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            path = PROFILE_DIR / f"{name}.html"
+            path.write_text(self._profiler.output_html(), encoding="utf-8")
+        else:
+            self._profiler.disable()
+            path = PROFILE_DIR / f"{name}.txt"
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            path.write_text(out.getvalue(), encoding="utf-8")
+        return path
+
+
+def _route_label(request: Request) -> str:
+    # Modelo da rota (/metrics/mttf), não o caminho, para não explodir a cardinalidade
+    route = request.scope.get("route")
+    return getattr(route, "path", "desconhecida")
+
+
+async def observe_request(request: Request, call_next):
+    """Middleware HTTP: contagem, duração e requisições em andamento; com
+    PROFILING_ENABLED e o cabeçalho X-Profile, grava o perfil da requisição
+    em logs/profiles/ e devolve o nome do arquivo em X-Profile-Report."""
+    profiler: Optional[RequestProfiler] = None
+    if profiling_enabled() and request.headers.get(PROFILE_HEADER):
+        try:
+            profiler = RequestProfiler()
+            profiler.start()
+        except Exception as e:
+            # cProfile não admite dois perfis ativos ao mesmo tempo
+            logger.warning(f"Could not start request profiler: {e}")
+            profiler = None
+
+    HTTP_IN_PROGRESS.inc()
+    start = time.perf_counter()
+    status = 500
+    report: Optional[Path] = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        HTTP_IN_PROGRESS.dec()
+        route = _route_label(request)
+        HTTP_SECONDS.labels(request.method, route).observe(time.perf_counter() - start)
+        HTTP_REQUESTS.labels(request.method, route, str(status)).inc()
+        if profiler is not None:
+            report = _save_profile(profiler, request.url.path)
+
+    if report is not None:
+        response.headers["X-Profile-Report"] = report.name
+    return response
+
+
+def _save_profile(profiler: RequestProfiler, path: str) -> Optional[Path]:
+    try:
+        report = profiler.stop(path)
+    except Exception as e:
+        logger.warning(f"Could not write request profile: {e}")
+        return None
+    logger.info(f"Profile ({profiler.kind}) for {path} written to {report}")
+    return report
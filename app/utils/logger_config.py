@@ -1,33 +1,96 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+LOG_DIR = Path(__file__).resolve().parents[2] / "logs"
+# Todos os loggers da aplicação ficam sob "app" e herdam seus handlers
+ROOT_LOGGER = "app"
+
+# Atributos padrão de LogRecord; o resto veio de `extra=` e vai para o JSON
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos passados em `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class _LocalQueueHandler(QueueHandler):
+    """Só resolve mensagem e traceback antes de enfileirar; a formatação
+    JSON fica com a thread do QueueListener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging() -> None:
+    """Instala uma única vez, no logger "app", um QueueHandler: as requisições
+    só enfileiram o registro e uma thread (QueueListener) grava no arquivo
+    rotativo e no console. LOG_LEVEL define o nível (padrão INFO)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+
+        LOG_DIR.mkdir(exist_ok=True)
+        formatter = JsonFormatter()
+        file_handler = RotatingFileHandler(
+            LOG_DIR / "agent_service.log",
+            maxBytes=10485760,  # 10MB
+            backupCount=5,
+            encoding="utf-8",
+        )
+        console_handler = logging.StreamHandler()
+        file_handler.setFormatter(formatter)
+        console_handler.setFormatter(formatter)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        logger.addHandler(_LocalQueueHandler(log_queue))
+        logger.propagate = False
+
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
 
 def setup_logger(name: str) -> logging.Logger:
-    # Create logs directory if it doesn't exist
-    log_dir = Path(__file__).resolve().parents[2] / "logs"
-    log_dir.mkdir(exist_ok=True)
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    
-    # Create handlers
-    file_handler = RotatingFileHandler(
-        log_dir / "agent_service.log",
-        maxBytes=10485760,  # 10MB
-        backupCount=5
-    )
-    console_handler = logging.StreamHandler()
-    
-    # Create formatters and add it to handlers
-    log_format = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    file_handler.setFormatter(log_format)
-    console_handler.setFormatter(log_format)
-    
-    # Add handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+    """Logger filho de "app"; pode ser chamado quantas vezes for preciso
+    sem duplicar handlers."""
+    configure_logging()
+    if name != ROOT_LOGGER and not name.startswith(f"{ROOT_LOGGER}."):
+        name = f"{ROOT_LOGGER}.{name}"
+    return logging.getLogger(name)
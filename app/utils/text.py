@@ -0,0 +1,20 @@
+import re
+import unicodedata
+from typing import List
+
+# Siglas com pontos (F.O, COD.0) ficam num único token
+_TOKEN_RE = re.compile(r"[A-Z0-9]+(?:\.[A-Z0-9]+)*")
+
+
+def normalize_upper(text: str) -> str:
+    """Maiúsculas sem acentos; caracteres corrompidos (OCUPAC?O) viram separadores."""
+    text = unicodedata.normalize("NFKD", text.upper())
+    return text.encode("ascii", "ignore").decode("utf-8")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(normalize_upper(text))
+
+
+def bigrams(tokens: List[str]) -> List[str]:
+    return [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
@@ -0,0 +1,210 @@
+"""Teste de carga: reproduz um arquivo JSONL de requisições contra a API e
+informa vazão e percentis de latência.
+
+Sem --url, a aplicação roda no mesmo processo (httpx + ASGI) com o Gemini e
+os embeddings substituídos por stubs locais (ver benchmarks/stubs.py):
+
+    python -m benchmarks.load --rows 10000 --concurrency 16 --iterations 20
+    python -m benchmarks.load --url http://127.0.0.1:8000 --concurrency 8
+
+Cada linha do JSONL é uma requisição:
+
+    {"name": "echo", "method": "POST", "path": "/agents/echo", "json": {"text": "..."}}
+    {"method": "GET", "path": "/metrics/mttr", "params": {"agrupar_por": "local"}}
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Logs por requisição distorcem as medições; LOG_LEVEL=INFO para vê-los
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+from benchmarks import synthetic
+
+WORKLOAD = Path(__file__).resolve().parent / "workload.jsonl"
+
+
+def load_workload(path: Path) -> List[Dict[str, Any]]:
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entry = json.loads(line)
+                entry.setdefault("method", "GET")
+                entry.setdefault("name", f"{entry['method']} {entry['path']}")
+                entries.append(entry)
+    return entries
+
+
+def _failed(response: httpx.Response) -> bool:
+    """Os routers devolvem erros como 200 com {"error": ...}; SSE, como evento error."""
+    if response.status_code >= 400:
+        return True
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        return "event: error" in response.text
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and "error" in body
+
+
+async def wait_ready(client: httpx.AsyncClient, agents: bool, timeout: float) -> None:
+    """Espera /health/ready (e, com `agents`, a busca pronta) antes de medir."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get("/health/ready")
+            if response.status_code == 200 and (response.json().get("agents") or not agents):
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Serviço não ficou pronto em {timeout:.0f} s")
+        await asyncio.sleep(0.5)
+
+
+async def replay(
+    client: httpx.AsyncClient, entries: List[Dict[str, Any]], concurrency: int
+) -> List[Dict[str, Any]]:
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for entry in entries:
+        queue.put_nowait(entry)
+    samples: List[Dict[str, Any]] = []
+
+    async def worker() -> None:
+        while True:
+            try:
+                entry = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    entry["method"], entry["path"], params=entry.get("params"), json=entry.get("json")
+                )
+                ok = not _failed(response)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                ok, status = False, type(e).__name__
+            samples.append(
+                {"name": entry["name"], "ok": ok, "status": status, "ms": (time.perf_counter() - start) * 1000}
+            )
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+def summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    def stats(group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        ms = np.array([s["ms"] for s in group])
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        return {
+            "requests": len(group),
+            "errors": sum(not s["ok"] for s in group),
+            "p50_ms": round(float(p50), 1),
+            "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1),
+            "max_ms": round(float(ms.max()), 1),
+        }
+
+    by_name: Dict[str, List[Dict[str, Any]]] = {}
+    for sample in samples:
+        by_name.setdefault(sample["name"], []).append(sample)
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+        "total": stats(samples),
+        "by_name": {name: stats(group) for name, group in sorted(by_name.items())},
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    total = report["total"]
+    print(
+        f"\n{total['requests']} requisições em {report['elapsed_s']} s "
+        f"({report['throughput_rps']} req/s), {total['errors']} com erro"
+    )
+    header = f"{'':<40} {'n':>6} {'erros':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+    print(header)
+    for name, row in [("total", total), *report["by_name"].items()]:
+        print(
+            f"{name[:40]:<40} {row['requests']:>6} {row['errors']:>6} "
+            f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['max_ms']:>9.1f}"
+        )
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    entries = load_workload(args.workload)
+    rng = random.Random(args.seed)
+    requests = entries * args.iterations
+    rng.shuffle(requests)
+    timeout = httpx.Timeout(args.timeout)
+
+    async def measure(client: httpx.AsyncClient) -> Dict[str, Any]:
+        await wait_ready(client, agents=True, timeout=args.ready_timeout)
+        if args.warmup:
+            # Primeiras chamadas preenchem caches e visões derivadas
+            await replay(client, entries * args.warmup, args.concurrency)
+        start = time.perf_counter()
+        samples = await replay(client, requests, args.concurrency)
+        return summarize(samples, time.perf_counter() - start)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            return await measure(client)
+
+    from benchmarks.stubs import stub_registry
+
+    from app.main import create_app
+
+    if args.no_cache:
+        os.environ["ANSWER_CACHE_SIZE"] = "0"
+    data_file = args.data or synthetic.ensure(args.rows, args.seed)
+    app = create_app(lambda: stub_registry(data_file, llm_latency=args.llm_latency_ms / 1000))
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            return await measure(client)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Reproduz um JSONL de requisições e mede vazão e latência")
+    parser.add_argument("--workload", type=Path, default=WORKLOAD)
+    parser.add_argument("--url", help="API já no ar; sem isso roda no processo com LLM e embeddings stub")
+    parser.add_argument("--data", type=Path, help="planilha para o modo local (padrão: sintética com --rows)")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=10, help="quantas vezes o arquivo é reproduzido")
+    parser.add_argument("--warmup", type=int, default=1, help="passadas do arquivo antes de medir")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="latência do LLM stub")
+    parser.add_argument("--no-cache", action="store_true", help="desliga o cache de respostas (modo local)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--ready-timeout", type=float, default=1800.0, help="espera máxima pelo aquecimento (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", type=Path, help="grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    report["config"] = {
+        key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()
+    }
+    print_report(report)
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\nRelatório em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
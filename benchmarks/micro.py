@@ -0,0 +1,225 @@
+"""Micro-benchmarks das etapas de dados e dos endpoints /metrics/* sobre
+planilhas sintéticas (ver benchmarks/synthetic.py).
+
+    python -m benchmarks.micro --rows 10000 100000
+    python -m benchmarks.micro --rows 1000000 --skip excel index --json benchmarks/results/1m.json
+
+Cada caso roda `--repeat` vezes; etapas memoizadas por versão do dataset
+(agregados, índice BM25, confiabilidade) são medidas a frio, sobre um
+snapshot novo a cada repetição. Os endpoints são medidos a frio (primeira
+chamada, que calcula a visão) e a quente (mediana das seguintes).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Logs por requisição distorcem as medições; LOG_LEVEL=INFO para vê-los
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from benchmarks import synthetic
+from benchmarks.load import wait_ready
+from benchmarks.stubs import StubEmbeddings, stub_registry
+
+from app.main import create_app
+from app.services.aggregates import build_aggregates
+from app.services.dataset_service import (
+    DatasetSnapshot,
+    clean_df,
+    file_digest,
+    load_and_clean_df,
+    read_cache,
+    write_cache,
+)
+from app.services.documents import iter_document_batches
+from app.services.indexer import sync_index
+from app.services.keyword_index import build_keyword_index
+from app.services.reliability_engine import compute_reliability
+from app.services.reliability_store import ReliabilityStore
+from app.services.search_filters import SearchFilters
+
+STEPS = ["excel", "clean", "cache", "documents", "aggregates", "keyword", "reliability", "endpoints", "index"]
+
+ENDPOINTS = [
+    ("/metrics/mttf", {}),
+    ("/metrics/mttr", {}),
+    ("/metrics/disponibilidade", {}),
+    ("/metrics/falhas", {}),
+    ("/metrics/quantidade-subsistemas", {}),
+    ("/metrics/disponibilidade-media", {}),
+    ("/metrics/mttr", {"data_inicio": "2021-01-01", "data_fim": "2021-12-31", "agrupar_por": "local"}),
+    ("/metrics/falhas", {"data_inicio": "2019-03-15", "data_fim": "2020-08-10", "prioridade": "alta"}),
+    ("/metrics/top-reclamantes", {"n": 10}),
+    ("/metrics/top-locais", {"n": 10}),
+    ("/metrics/causas", {"subsistema": "SINCDVCAV"}),
+    ("/metrics/causas", {"padrao": "falsa-ocupacao"}),
+]
+
+
+def measure(name: str, fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    times: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "case": name,
+        "repeat": repeat,
+        "min_ms": round(min(times), 2),
+        "median_ms": round(statistics.median(times), 2),
+        "mean_ms": round(statistics.fmean(times), 2),
+    }
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "commit": commit,
+    }
+
+
+def _snapshot(df: pd.DataFrame, timestamps: pd.DataFrame) -> DatasetSnapshot:
+    """Snapshot novo (sem visões derivadas) com os mesmos dados."""
+    return DatasetSnapshot(
+        df=df, timestamps=timestamps, version=f"bench-{time.perf_counter_ns()}", mtime=0.0, size=0, loaded_at=time.time()
+    )
+
+
+async def _endpoint_cases(path: Path, repeat: int) -> List[Dict[str, Any]]:
+    import httpx
+
+    # Só a planilha é aquecida: as visões de cada endpoint são medidas a frio
+    app = create_app(lambda: stub_registry(path), warmup=("dataset",))
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await wait_ready(client, agents=False, timeout=3600)
+            for url, params in ENDPOINTS:
+                label = url + ("?" + "&".join(f"{k}={v}" for k, v in params.items()) if params else "")
+                times = []
+                for _ in range(repeat + 1):
+                    start = time.perf_counter()
+                    response = await client.get(url, params=params)
+                    times.append((time.perf_counter() - start) * 1000)
+                    body = response.json()
+                    if response.status_code != 200 or (isinstance(body, dict) and "error" in body):
+                        raise RuntimeError(f"{label}: {response.status_code} {str(body)[:200]}")
+                results.append(
+                    {
+                        "case": f"GET {label}",
+                        "repeat": repeat,
+                        "cold_ms": round(times[0], 2),
+                        "median_ms": round(statistics.median(times[1:]), 2),
+                        "min_ms": round(min(times[1:]), 2),
+                    }
+                )
+    return results
+
+
+def _index_cases(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    from langchain_community.vectorstores import Chroma
+
+    with tempfile.TemporaryDirectory(prefix="bench-index-") as tmp:
+        vectordb = Chroma(
+            collection_name="bench", persist_directory=tmp, embedding_function=StubEmbeddings(size=384)
+        )
+        results = [measure("index build (stub embeddings)", lambda: sync_index(vectordb, iter_document_batches(df)), 1)]
+        # Sem mudanças na planilha: só compara hashes
+        results.append(measure("index resync (unchanged)", lambda: sync_index(vectordb, iter_document_batches(df)), 1))
+    return results
+
+
+def run(rows: int, repeat: int, skip: List[str], seed: int) -> List[Dict[str, Any]]:
+    # A API só lê Excel: a planilha é gerada (uma vez) se algum caso precisar dela
+    needs_file = "excel" not in skip or "endpoints" not in skip
+    path = synthetic.ensure(rows, seed) if needs_file else synthetic.default_path(rows)
+    results: List[Dict[str, Any]] = []
+
+    def add(result: Dict[str, Any]) -> None:
+        result["rows"] = rows
+        results.append(result)
+        extra = f" (frio {result['cold_ms']} ms)" if "cold_ms" in result else ""
+        print(f"  {result['case']:<70} mediana {result['median_ms']:>10.2f} ms{extra}", flush=True)
+
+    print(f"\n{rows} linhas ({path.name})")
+    raw = pd.read_excel(path, header=0) if "excel" not in skip else None
+    if "excel" not in skip:
+        add(measure("load_and_clean_df (Excel + limpeza)", lambda: load_and_clean_df(path), min(repeat, 3)))
+    if raw is None:
+        raw = synthetic.generate(rows, seed)
+    df, timestamps = clean_df(raw.copy())
+
+    if "clean" not in skip:
+        add(measure("clean_df", lambda: clean_df(raw.copy()), repeat))
+    if "cache" not in skip:
+        with tempfile.TemporaryDirectory(prefix="bench-cache-") as tmp:
+            target, digest = Path(tmp) / path.name, "0" * 64
+            add(measure("write_cache (Parquet)", lambda: write_cache(target, digest, df, timestamps), repeat))
+            add(measure("read_cache (Parquet)", lambda: read_cache(target, digest), repeat))
+        if "excel" not in skip:
+            add(measure("file_digest (sha256)", lambda: file_digest(path), repeat))
+    if "documents" not in skip:
+        add(measure("documentos (iter_document_batches)", lambda: [d for b in iter_document_batches(df) for d in b], repeat))
+    if "aggregates" not in skip:
+        add(measure("build_aggregates", lambda: build_aggregates(_snapshot(df, timestamps)), repeat))
+    if "keyword" not in skip:
+        add(measure("build_keyword_index (BM25)", lambda: build_keyword_index(_snapshot(df, timestamps)), repeat))
+    if "reliability" not in skip:
+        add(measure("compute_reliability", lambda: compute_reliability(df, timestamps), repeat))
+        add(
+            measure(
+                "ReliabilityStore.report (partições a frio)",
+                lambda: ReliabilityStore().report(_snapshot(df, timestamps), SearchFilters()),
+                repeat,
+            )
+        )
+    if "endpoints" not in skip:
+        for result in asyncio.run(_endpoint_cases(path, repeat)):
+            add(result)
+    if "index" not in skip:
+        for result in _index_cases(df):
+            add(result)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das etapas de dados e de /metrics/*")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip", nargs="*", default=[], choices=STEPS)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args()
+
+    env = environment()
+    print(json.dumps(env))
+    results = [r for rows in args.rows for r in run(rows, args.repeat, args.skip, args.seed)]
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps({"environment": env, "results": results}, indent=2), encoding="utf-8")
+        print(f"\nResultados em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Stand-ins locais para o Gemini e o modelo de embeddings, para medir o
+serviço sem rede nem GPU: o LLM responde depois de uma latência fixa e os
+embeddings são vetores determinísticos derivados do hash do texto."""
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.services.agent_service import AgentService
+from app.services.dataset_service import DatasetService
+from app.services.registry import ServiceRegistry
+
+STUB_ANSWER = (
+    "Com base nos registros recuperados, as falhas mais recorrentes são falsas ocupações "
+    "de CDV, em geral resolvidas com limpeza de filtro ou substituição de junta isolante."
+)
+
+
+class StubEmbeddings(DeterministicFakeEmbedding):
+    """Vetores fixos por texto; `slug` nomeia a coleção no Chroma como no
+    EmbeddingPipeline."""
+
+    @property
+    def slug(self) -> str:
+        return f"stub-{self.size}"
+
+
+class StubChatModel(BaseChatModel):
+    """Responde `answer` após `latency` segundos; em streaming, divide a
+    resposta em `chunks` partes espaçadas igualmente. Informa uso de tokens
+    (~4 caracteres por token) como o Gemini."""
+
+    latency: float = 0.5
+    answer: str = STUB_ANSWER
+    chunks: int = 8
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _usage(self, messages: List[BaseMessage]) -> dict:
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(self.answer) // 4
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        message = AIMessage(content=self.answer, usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _pieces(self) -> List[str]:
+        size = max(1, -(-len(self.answer) // self.chunks))
+        return [self.answer[i:i + size] for i in range(0, len(self.answer), size)]
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        pieces = self._pieces()
+        for i, piece in enumerate(pieces):
+            time.sleep(self.latency / len(pieces))
+            usage = self._usage(messages) if i == len(pieces) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        pieces = self._pieces()
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(self.latency / len(pieces))
+            usage = self._usage(messages) if i == len(pieces) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+
+def stub_registry(
+    data_file: Path,
+    llm_latency: float = 0.5,
+    embedding_size: int = 384,
+    chroma_dir: Optional[Path] = None,
+) -> ServiceRegistry:
+    """Registry com a planilha indicada, LLM e embeddings stub e um Chroma
+    temporário (ou `chroma_dir`, para reaproveitar o índice entre execuções)."""
+    dataset = DatasetService(data_file)
+    agent = AgentService(
+        dataset,
+        embeddings=StubEmbeddings(size=embedding_size),
+        llm=StubChatModel(latency=llm_latency),
+        chroma_dir=chroma_dir or Path(tempfile.mkdtemp(prefix="bench-chroma-")),
+    )
+    return ServiceRegistry(dataset=dataset, agent=agent)
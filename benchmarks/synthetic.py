@@ -0,0 +1,202 @@
+"""Gerador de planilhas sintéticas no formato de data/dados.xlsx, para
+benchmarks em 10 mil, 100 mil e 1 milhão de linhas.
+
+    python -m benchmarks.synthetic --rows 100000
+    python -m benchmarks.synthetic --rows 1000000 --out benchmarks/data/falhas-1m.parquet
+
+Mesma semente -> mesma planilha. As distribuições imitam a amostra real:
+~200 subsistemas (estações e trechos entre estações), prioridade Baixa/Alta/
+Media em ~62/33/5%, descrições de falsa ocupação e código zero nos CDVs e
+tempos de reparo com cauda longa.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "solicitacao",
+    "subsistema",
+    "local",
+    "dt_falha",
+    "hr_falha",
+    "prioridade",
+    "descricao",
+    "dt_enc",
+    "hr_enc",
+    "solucao",
+    "ordem",
+    "reclamante",
+]
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+STATIONS = [
+    ("REC", "RECIFE"),
+    ("JOA", "JOANA BEZERRA"),
+    ("AFO", "AFOGADOS"),
+    ("IPI", "IPIRANGA"),
+    ("MAG", "MANGUEIRA"),
+    ("SMA", "SANTA LUZIA"),
+    ("WEK", "WERNECK"),
+    ("BAR", "BARRO"),
+    ("TEJ", "TEJIPIO"),
+    ("COQ", "COQUEIRAL"),
+    ("FLO", "FLORIANO"),
+    ("CAV", "CAVALEIRO"),
+    ("JAB", "JABOATAO"),
+    ("COD", "COSME E DAMIAO"),
+    ("GIB", "CAMARAGIBE"),
+    ("LAR", "LARGO DA PAZ"),
+    ("ALT", "ALTO DO CEU"),
+    ("ANT", "ANTONIO FALCAO"),
+    ("IMB", "IMBIRIBEIRA"),
+    ("PRA", "PRAZERES"),
+]
+PRIORIDADES = ["Baixa", "Alta", "Media"]
+PRIORIDADE_P = [0.62, 0.33, 0.05]
+RECLAMANTES = [
+    "RUBENS", "GEORGE", "CESAR", "VALDIR", "BRENO", "CARLOS", "ERIC", "ADILSON", "PAIVA",
+    "VAZ", "RUI(PMC)", "WILLIAMS", "ODON-CCO", "DE PAULA", "MAX-CCO", "JOSE", "MARCOS",
+    "FABIO", "ANDRE", "PAULO", "SERGIO", "LUCAS", "RAFAEL", "DIEGO", "EDSON", "FELIPE",
+    "HUGO", "IGOR", "JULIO", "LEANDRO", "MARIO", "NELSON", "OTAVIO", "PEDRO", "RENATO",
+]
+# O "?" no lugar de Ç/Ã reproduz a codificação da planilha original
+SYMPTOMS = [
+    ("FALSA OCUPAC?O CONSTANTE NO CDV ", 0.30),
+    ("FALSA OCUPAC?O INTERMITENTE NO CDV ", 0.22),
+    ("FALSA OCUPAC?O NO CDV ", 0.12),
+    ("F.O NO CDV ", 0.04),
+    ("CODIGO ZERO NO CDV ", 0.10),
+    ("CODIGO 0 NO CDV ", 0.06),
+    ("SINALEIRO APAGADO NO CDV ", 0.06),
+    ("MAQUINA DE CHAVE SEM INDICAC?O NO CDV ", 0.06),
+    ("FALHA DE COMUNICAC?O NO CDV ", 0.04),
+]
+REMEDIES = [
+    "LIMPEZA NO FILTRO - FALHA CORRIGIDA.",
+    "SUBSTITUIC?O DA JUNTA ISOLANTE. NORMALIZADO.",
+    "CABO DE SINALIZAC?O PARTIDO ENTRE A CASE E O BOND. FIAC?O REFEITA.",
+    "MAU CONTATO NO RX - REPARADO.",
+    "NADA CONSTATADO. CORRENTE DE ATC MEDIDA: 5,0 A.",
+    "FUSIVEL ABERTO. SUBSTITUIC?O DO FUSIVEL, CIRCUITO NORMALIZADO.",
+    "SAFETY CLIP FORA DE POSIC?O AJUSTADO E TRAVADO.",
+    "A FALHA DEIXOU DE OCORRER DEVIDO A ATUAC?O DO MAGROTON.",
+    "SS ABERTA PARA A EQUIPE DE VIA, AGUARDANDO REPARO.",
+    "PAR CASADO NAO ESTAVA CONECTADO. REFEITA A CONEX?O.",
+]
+
+
+def subsystem_catalog(rng: np.random.Generator, trechos: int = 180) -> List[Tuple[str, str]]:
+    """(subsistema, local): um por estação e `trechos` entre estações vizinhas."""
+    catalog = [(f"SINCDV{code}", f"ESTACAO {name}") for code, name in STATIONS]
+    catalog.append(("SINCDVPCA", "PATIO CAVALEIRO"))
+    pairs = list(zip(STATIONS, STATIONS[1:]))
+    for i in range(trechos):
+        (code_a, name_a), (code_b, name_b) = pairs[rng.integers(len(pairs))]
+        cdv = 2 * (i + 1)
+        catalog.append((f"SINCDV{cdv:03d}{code_a}{code_b}", f"TRECHO {name_a} - {name_b}"))
+    return catalog
+
+
+def _hhmm(minutes: np.ndarray) -> pd.Series:
+    minutes = minutes.astype(np.int64)
+    return pd.Series([f"{m // 60:02d}:{m % 60:02d}" for m in minutes], dtype=object)
+
+
+def generate(rows: int, seed: int = 7, start: str = "2018-01-01", years: float = 5.0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    catalog = subsystem_catalog(rng)
+    # Frequências desiguais: o subsistema mais citado fica com ~5% das falhas, como na amostra real
+    weights = (rng.permutation(len(catalog)) + 1.0) ** -0.6
+    which = rng.choice(len(catalog), size=rows, p=weights / weights.sum())
+    subsistema = np.array([s for s, _ in catalog], dtype=object)[which]
+    local = np.array([l for _, l in catalog], dtype=object)[which]
+
+    first = pd.Timestamp(start)
+    span_minutes = int(years * 365 * 24 * 60)
+    falha_min = np.sort(rng.integers(0, span_minutes, size=rows))
+    falha = first + pd.to_timedelta(falha_min, unit="m")
+    # Reparo lognormal: mediana ~6 h, alguns casos de semanas
+    reparo_min = np.clip(rng.lognormal(np.log(360), 1.3, size=rows), 5, 90 * 24 * 60)
+    enc = falha + pd.to_timedelta(reparo_min.astype(np.int64), unit="m")
+
+    symptoms, symptom_p = zip(*SYMPTOMS)
+    symptom = np.array(symptoms, dtype=object)[
+        rng.choice(len(symptoms), size=rows, p=np.array(symptom_p) / sum(symptom_p))
+    ]
+    cdv = rng.integers(1, 200, size=rows).astype(str)
+    sufixo = np.where(rng.random(rows) < 0.3, "T.", ".")
+    descricao = pd.Series(symptom + cdv + sufixo, dtype=object)
+    remedy = np.array(REMEDIES, dtype=object)[rng.integers(len(REMEDIES), size=rows)]
+    solucao = descricao + " \n" + remedy
+
+    df = pd.DataFrame(
+        {
+            "solicitacao": 83514 + np.arange(rows, dtype=np.int64),
+            "subsistema": subsistema,
+            "local": local,
+            "dt_falha": falha.normalize(),
+            "hr_falha": _hhmm(falha.hour * 60 + falha.minute),
+            "prioridade": np.array(PRIORIDADES, dtype=object)[rng.choice(3, size=rows, p=PRIORIDADE_P)],
+            "descricao": descricao,
+            "dt_enc": enc.normalize(),
+            "hr_enc": _hhmm(enc.hour * 60 + enc.minute),
+            "solucao": solucao,
+            "ordem": (370216 + np.arange(rows) * 3).astype(np.float64),
+            "reclamante": np.array(RECLAMANTES, dtype=object)[rng.integers(len(RECLAMANTES), size=rows)],
+        },
+        columns=COLUMNS,
+    )
+
+    # Lacunas como na planilha real: chamados em aberto, hora ou ordem faltando
+    abertos = rng.random(rows) < 0.03
+    df.loc[abertos, ["dt_enc", "hr_enc"]] = None
+    df.loc[rng.random(rows) < 0.01, "hr_falha"] = None
+    df.loc[rng.random(rows) < 0.05, "ordem"] = np.nan
+    return df
+
+
+def default_path(rows: int, suffix: str = ".xlsx") -> Path:
+    label = f"{rows // 1_000_000}m" if rows % 1_000_000 == 0 else f"{rows // 1000}k" if rows % 1000 == 0 else str(rows)
+    return DATA_DIR / f"falhas-{label}{suffix}"
+
+
+def write(df: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False, engine="openpyxl")
+
+
+def ensure(rows: int, seed: int = 7, suffix: str = ".xlsx") -> Path:
+    """Caminho da planilha sintética com `rows` linhas, gerada se ainda não existir."""
+    path = default_path(rows, suffix)
+    if not path.exists():
+        write(generate(rows, seed), path)
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera planilhas sintéticas no formato de dados.xlsx")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", type=Path, help="arquivo de saída (.xlsx ou .parquet); só com um --rows")
+    parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx")
+    args = parser.parse_args()
+    if args.out and len(args.rows) > 1:
+        parser.error("--out aceita um único --rows")
+
+    for rows in args.rows:
+        path = args.out or default_path(rows, f".{args.format}")
+        start = time.perf_counter()
+        df = generate(rows, args.seed)
+        write(df, path)
+        print(f"{rows} linhas -> {path} ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Fixtures compartilhadas: a planilha de exemplo (data/dados.xlsx) e os
+serviços montados com LLM e embeddings stub (ver benchmarks/stubs.py)."""
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.stubs import stub_registry
+
+from app.main import create_app
+from app.services.dataset_service import DatasetService
+
+DATA_FILE = Path(__file__).resolve().parents[1] / "data" / "dados.xlsx"
+
+
+@pytest.fixture(scope="session")
+def data_file() -> Path:
+    return DATA_FILE
+
+
+@pytest.fixture
+def sheet(tmp_path) -> Path:
+    """Cópia da planilha que o teste pode alterar."""
+    path = tmp_path / "dados.xlsx"
+    shutil.copy(DATA_FILE, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def snapshot():
+    return DatasetService(DATA_FILE).snapshot()
+
+
+@pytest.fixture
+def stub_agent(tmp_path):
+    """AgentService com LLM sem latência e Chroma vazio em tmp_path."""
+    registry = stub_registry(DATA_FILE, llm_latency=0, chroma_dir=tmp_path / "chroma")
+    yield registry.agent
+    registry.close()
+
+
+@pytest.fixture(scope="module")
+def warm_agent(tmp_path_factory):
+    """AgentService com índice vetorial, BM25 e exemplos já carregados."""
+    registry = stub_registry(DATA_FILE, llm_latency=0, chroma_dir=tmp_path_factory.mktemp("chroma"))
+    registry.agent.warm_retrieval()
+    yield registry.agent
+    registry.close()
+
+
+@pytest.fixture(scope="module")
+def client():
+    """API com os serviços stub; só a planilha é aquecida."""
+    app = create_app(lambda: stub_registry(DATA_FILE), warmup=("dataset",))
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 60
+        while client.get("/health/ready").status_code != 200:
+            assert time.monotonic() < deadline, "dataset não carregou"
+            time.sleep(0.1)
+        yield client
@@ -0,0 +1,47 @@
+"""AgentService.abatch com LLM e embeddings stub (ver benchmarks/stubs.py)."""
+import asyncio
+
+from benchmarks.stubs import StubEmbeddings
+
+
+def test_batch_reports_preparation_errors_per_item(stub_agent, monkeypatch):
+    def broken() -> None:
+        raise RuntimeError("índice indisponível")
+
+    monkeypatch.setattr(stub_agent, "_cache_generation", broken)
+    texts = [
+        "Como resolver falsa ocupação no CDV?",
+        "O que causa código zero no CDV?",
+        "Houve sinaleiro apagado na estação Recife?",
+    ]
+    out = asyncio.run(stub_agent.abatch(texts))
+
+    rag, routed, other = out["results"]
+    # Perguntas de métricas não passam pela busca e continuam respondidas
+    assert routed["route"] == "causas_codigo_zero"
+    for item in (rag, other):
+        assert item["error"] == "índice indisponível"
+        assert "completed_ms" in item["timing"]
+
+
+def test_batch_embeds_questions_as_queries(stub_agent, monkeypatch):
+    stub_agent.warm_retrieval()
+    embedded = []
+    query = StubEmbeddings.embed_query
+
+    def embed_documents(self, texts):
+        raise AssertionError("perguntas não devem ir para o embedding de documentos")
+
+    def embed_query(self, text):
+        embedded.append(text)
+        return query(self, text)
+
+    monkeypatch.setattr(StubEmbeddings, "embed_documents", embed_documents)
+    monkeypatch.setattr(StubEmbeddings, "embed_query", embed_query)
+    texts = ["Como resolver falsa ocupação no CDV?", "Houve sinaleiro apagado na estação Recife?"]
+    out = asyncio.run(stub_agent.abatch(texts))
+
+    assert sorted(embedded) == sorted(texts)
+    for item in out["results"]:
+        assert "error" not in item
+        assert item["timing"]["llm_ms"] <= item["timing"]["completed_ms"]
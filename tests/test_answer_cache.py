@@ -0,0 +1,42 @@
+"""SemanticAnswerCache: acerto exato e por similaridade, expiração e
+descarte quando a geração (dataset + índice) muda."""
+import time
+
+from app.services.answer_cache import SemanticAnswerCache
+
+VECTOR = [1.0, 0.0, 0.0]
+NEAR = [0.99, 0.05, 0.0]
+FAR = [0.0, 1.0, 0.0]
+
+
+def test_exact_and_semantic_hits():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put("Como resolver falsa ocupação no CDV?", VECTOR, "g1", "resposta")
+
+    assert cache.get_exact("como resolver falsa ocupacao no cdv", "g1") == "resposta"
+    assert cache.get_similar("Como corrigir falsa ocupação no CDV?", NEAR, "g1") == "resposta"
+    assert cache.get_similar("Como corrigir falsa ocupação no CDV?", FAR, "g1") is None
+    assert (cache.hits, cache.semantic_hits, cache.misses) == (2, 1, 1)
+
+
+def test_codes_must_match_for_semantic_hit():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put("Qual o MTTF do SINCDVCAV?", VECTOR, "g1", "cav")
+    assert cache.get_similar("Qual o MTTF do SINCDVFLO?", VECTOR, "g1") is None
+
+
+def test_entries_expire_after_ttl():
+    cache = SemanticAnswerCache(ttl_seconds=0.05)
+    cache.put("pergunta", VECTOR, "g1", "resposta")
+    assert cache.get_exact("pergunta", "g1") == "resposta"
+    time.sleep(0.1)
+    assert cache.get_exact("pergunta", "g1") is None
+    assert cache.get_similar("pergunta", VECTOR, "g1") is None
+
+
+def test_new_generation_discards_entries():
+    cache = SemanticAnswerCache()
+    cache.put("pergunta", VECTOR, "g1", "resposta")
+    assert cache.get_exact("pergunta", "g2") is None
+    assert cache.get_exact("pergunta", "g1") is None
+    assert cache.invalidations == 1
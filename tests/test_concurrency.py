@@ -0,0 +1,73 @@
+"""Concorrência do agente: perguntas idênticas em andamento compartilham a
+chamada ao LLM e no máximo LLM_MAX_CONCURRENCY chamadas rodam juntas."""
+import asyncio
+
+from benchmarks.stubs import STUB_ANSWER, StubChatModel
+
+from app.services.concurrency import RequestCoalescer
+
+
+def test_coalescer_runs_identical_keys_once():
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return key
+
+    async def main():
+        coalescer = RequestCoalescer()
+        results = await asyncio.gather(
+            *(coalescer.run("a", lambda: work("a")) for _ in range(5)),
+            coalescer.run("b", lambda: work("b")),
+        )
+        return coalescer, results
+
+    coalescer, results = asyncio.run(main())
+    assert results == ["a"] * 5 + ["b"]
+    assert sorted(calls) == ["a", "b"]
+    assert coalescer.coalesced == 4
+    assert coalescer.inflight == 0
+
+
+def _track_llm_calls(monkeypatch):
+    """Troca a chamada do LLM stub por uma que registra as chamadas e o
+    máximo de chamadas simultâneas."""
+    state = {"calls": 0, "running": 0, "peak": 0}
+
+    async def agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        state["calls"] += 1
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.05)
+        state["running"] -= 1
+        return self._result(messages)
+
+    monkeypatch.setattr(StubChatModel, "_agenerate", agenerate)
+    return state
+
+
+def test_identical_questions_share_one_llm_call(stub_agent, monkeypatch):
+    stub_agent.warm_retrieval()
+    state = _track_llm_calls(monkeypatch)
+
+    async def main():
+        text = "Houve sinaleiro apagado na estação Recife?"
+        return await asyncio.gather(*(stub_agent.aecho(text) for _ in range(4)))
+
+    results = asyncio.run(main())
+    assert state["calls"] == 1
+    assert all(result["text"] == STUB_ANSWER for result in results)
+
+
+def test_llm_calls_respect_concurrency_limit(stub_agent, monkeypatch):
+    stub_agent.warm_retrieval()
+    state = _track_llm_calls(monkeypatch)
+    stub_agent._llm_semaphore = asyncio.Semaphore(2)
+
+    texts = [f"Houve sinaleiro apagado no trecho {n}?" for n in range(6)]
+    out = asyncio.run(stub_agent.abatch(texts))
+
+    assert all("error" not in item for item in out["results"])
+    assert state["calls"] == 6
+    assert state["peak"] == 2
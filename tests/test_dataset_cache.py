@@ -0,0 +1,36 @@
+"""Cache Parquet ao lado da planilha: mesmo DataFrame que o Excel, reuso
+enquanto o conteúdo não muda e troca do arquivo quando muda."""
+import pandas as pd
+
+from app.services import dataset_service
+from app.services.dataset_service import cache_path, file_digest, load_dataset
+
+
+def test_sidecar_matches_excel(sheet):
+    df, timestamps = load_dataset(sheet)
+    assert cache_path(sheet, file_digest(sheet)).exists()
+
+    cached_df, cached_timestamps = load_dataset(sheet)
+    pd.testing.assert_frame_equal(cached_df, df)
+    pd.testing.assert_frame_equal(cached_timestamps, timestamps)
+    assert cached_df["hr_enc"].isna().equals(df["hr_enc"].isna())
+
+
+def test_sidecar_is_reused_until_the_sheet_changes(sheet, monkeypatch):
+    load_dataset(sheet)
+    first = cache_path(sheet, file_digest(sheet))
+
+    def no_excel(path):
+        raise AssertionError("o Excel não deveria ser lido com o cache válido")
+
+    with monkeypatch.context() as m:
+        m.setattr(dataset_service, "load_and_clean_df", no_excel)
+        load_dataset(sheet)
+
+    original = pd.read_excel(sheet, header=0)
+    original.iloc[:-1].to_excel(sheet, index=False)
+    df, _ = load_dataset(sheet)
+
+    assert len(df) == len(original) - 1
+    assert cache_path(sheet, file_digest(sheet)).exists()
+    assert not first.exists()
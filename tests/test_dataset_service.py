@@ -0,0 +1,44 @@
+"""DatasetService: recarga em segundo plano quando a planilha muda e
+reaproveitamento dos dados quando só o mtime muda."""
+import os
+import time
+
+import pandas as pd
+
+from app.services.dataset_service import DatasetService
+
+
+def _wait_for(service: DatasetService, condition, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        current = service.snapshot()
+        if condition(current):
+            return current
+        assert time.monotonic() < deadline, "a planilha não foi recarregada"
+        time.sleep(0.05)
+
+
+def test_reloads_when_content_changes(sheet):
+    service = DatasetService(sheet, check_interval=0)
+    first = service.snapshot()
+
+    original = pd.read_excel(sheet, header=0)
+    original.iloc[:-1].to_excel(sheet, index=False)
+    reloaded = _wait_for(service, lambda s: s.version != first.version)
+
+    assert len(reloaded.df) == len(first.df) - 1
+    # A versão anterior continua íntegra para quem ainda a usa
+    assert len(first.df) == len(original)
+
+
+def test_touch_keeps_data_and_derived_views(sheet):
+    service = DatasetService(sheet, check_interval=0)
+    first = service.snapshot()
+    view = first.memo("test", lambda s: object())
+
+    os.utime(sheet, (first.mtime + 60, first.mtime + 60))
+    touched = _wait_for(service, lambda s: s.mtime != first.mtime)
+
+    assert touched.version == first.version
+    assert touched.df is first.df
+    assert touched.memo("test", lambda s: object()) is view
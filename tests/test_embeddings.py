@@ -0,0 +1,40 @@
+"""EmbeddingPipeline: lotes da indexação usam um pool único e duradouro.
+O pool de processos é trocado por threads e o modelo por um fake, para o
+teste não depender de baixar modelos."""
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from app.services import embeddings
+from app.services.documents import BATCH_SIZE
+from app.services.embeddings import EmbeddingPipeline
+
+
+def test_index_batches_share_one_pool(monkeypatch):
+    pools = []
+
+    def fake_pool(max_workers, mp_context, initializer, initargs):
+        pool = ThreadPoolExecutor(max_workers=max_workers, initializer=initializer, initargs=initargs)
+        pools.append(pool)
+        return pool
+
+    monkeypatch.setattr(embeddings, "create_embedder", lambda *args: DeterministicFakeEmbedding(size=8))
+    monkeypatch.setattr(embeddings, "ProcessPoolExecutor", fake_pool)
+    pipeline = EmbeddingPipeline("fake", "fake", batch_size=32, workers=4)
+
+    # Dois lotes do tamanho que o indexador envia ao Chroma
+    for start in (0, BATCH_SIZE):
+        texts = [f"documento {i}" for i in range(start, start + BATCH_SIZE)]
+        vectors = pipeline.embed_documents(texts)
+        assert vectors == DeterministicFakeEmbedding(size=8).embed_documents(texts)
+
+    assert len(pools) == 1
+    pipeline.close()
+    assert pipeline._pool is None
+
+
+def test_small_batches_stay_in_process(monkeypatch):
+    monkeypatch.setattr(embeddings, "create_embedder", lambda *args: DeterministicFakeEmbedding(size=8))
+    pipeline = EmbeddingPipeline("fake", "fake", batch_size=32, workers=4, parallel_threshold=1000)
+    pipeline.embed_documents([f"documento {i}" for i in range(BATCH_SIZE)])
+    assert pipeline._pool is None
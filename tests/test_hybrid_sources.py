@@ -0,0 +1,29 @@
+"""Fontes da busca híbrida: `score` continua sendo a relevância vetorial
+(a mesma da busca no Chroma) e a fusão vai em `rrf_score`."""
+import pytest
+
+from app.services.keyword_index import RRF_K
+
+
+def test_sources_keep_vector_similarity(warm_agent):
+    text = "FALSA OCUPACAO NO CDV SINCDVCAV"
+    embedding = warm_agent.embeddings.embed_query(text)
+    hits = warm_agent.hybrid_retrieve(text, embedding, k=5)
+    # Busca vetorial restrita aos documentos devolvidos: inclui os que só o BM25 achou
+    found = warm_agent.vectordb._collection.query(
+        query_embeddings=[embedding],
+        n_results=len(hits),
+        where={"row_index": {"$in": [doc.metadata["row_index"] for doc, _ in hits]}},
+        include=["distances"],
+    )
+    relevance = warm_agent.vectordb._select_relevance_score_fn()
+    dense = {doc_id: relevance(d) for doc_id, d in zip(found["ids"][0], found["distances"][0])}
+
+    sources = warm_agent._format_sources(hits)
+    assert len(sources) == 5
+    for (doc, score), source in zip(hits, sources):
+        assert score == pytest.approx(dense[doc.id], rel=1e-5)
+        assert source["score"] == round(score, 4)
+        # Cada documento soma no máximo 1 / (RRF_K + 1) por busca
+        assert 0 < source["rrf_score"] <= 2 / (RRF_K + 1)
+    assert [s["rrf_score"] for s in sources] == sorted((s["rrf_score"] for s in sources), reverse=True)
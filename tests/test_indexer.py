@@ -0,0 +1,102 @@
+"""sync_index: só linhas novas ou alteradas são embedadas, as removidas
+são apagadas e mudanças só de metadados não recalculam embeddings; a
+sincronização em segundo plano espera antes de repetir uma falha."""
+import time
+
+import pytest
+from langchain_community.vectorstores import Chroma
+
+from benchmarks.stubs import StubEmbeddings
+
+from app.services.documents import iter_document_batches
+from app.services.indexer import sync_index
+
+
+@pytest.fixture
+def embedded(monkeypatch):
+    texts = []
+    embed = StubEmbeddings.embed_documents
+
+    def counting(self, batch):
+        texts.extend(batch)
+        return embed(self, batch)
+
+    monkeypatch.setattr(StubEmbeddings, "embed_documents", counting)
+    return texts
+
+
+@pytest.fixture
+def vectordb(tmp_path):
+    return Chroma(collection_name="test", persist_directory=str(tmp_path), embedding_function=StubEmbeddings(size=16))
+
+
+def _sync(vectordb, df):
+    return sync_index(vectordb, iter_document_batches(df, batch_size=16))
+
+
+def test_added_and_removed_rows(snapshot, vectordb, embedded):
+    rows = snapshot.df.iloc[:40]
+    assert _sync(vectordb, rows).added == 40
+    embedded.clear()
+
+    stats = _sync(vectordb, snapshot.df.iloc[1:45])
+
+    assert (stats.added, stats.deleted, stats.relocated, stats.unchanged) == (5, 1, 0, 39)
+    assert len(embedded) == 5
+    assert vectordb._collection.count() == 44
+
+
+def test_edited_row_replaces_its_document(snapshot, vectordb, embedded):
+    rows = snapshot.df.iloc[:20].copy()
+    _sync(vectordb, rows)
+    embedded.clear()
+
+    rows["descricao"] = rows["descricao"].astype("string")
+    rows.loc[rows.index[3], "descricao"] = "CDV COM FALSA OCUPACAO APOS CHUVA"
+    stats = _sync(vectordb, rows)
+
+    assert (stats.added, stats.deleted, stats.unchanged) == (1, 1, 19)
+    assert embedded == [doc.page_content for doc in next(iter_document_batches(rows.iloc[3:4]))]
+
+
+def test_metadata_only_change_skips_embedding(snapshot, vectordb, embedded):
+    rows = snapshot.df.iloc[:20]
+    _sync(vectordb, rows)
+    embedded.clear()
+
+    # Mesmo conteúdo em outras posições da planilha: só row_index muda
+    shifted = rows.set_axis(rows.index + 100)
+    stats = _sync(vectordb, shifted)
+
+    assert (stats.added, stats.deleted, stats.relocated) == (0, 0, 20)
+    assert embedded == []
+    stored = vectordb.get(include=["metadatas"])
+    assert sorted(meta["row_index"] for meta in stored["metadatas"]) == list(range(100, 120))
+
+
+def _wait_refresh(agent, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while agent._refresh_thread is not None:
+        assert time.monotonic() < deadline, "a sincronização não terminou"
+        time.sleep(0.01)
+
+
+def test_failed_background_refresh_waits_before_retrying(stub_agent, monkeypatch):
+    attempts = []
+
+    def failing_sync():
+        attempts.append(1)
+        raise RuntimeError("chroma indisponível")
+
+    monkeypatch.setattr(stub_agent, "sync_index", failing_sync)
+    stub_agent._maybe_refresh_index("nova-versao")
+    _wait_refresh(stub_agent)
+    for _ in range(3):
+        stub_agent._maybe_refresh_index("nova-versao")
+        assert stub_agent._refresh_thread is None
+    assert len(attempts) == 1
+
+    stub_agent.index_refresh_retry_seconds = 0
+    stub_agent._maybe_refresh_index("nova-versao")
+    _wait_refresh(stub_agent)
+    assert len(attempts) == 2
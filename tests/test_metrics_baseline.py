@@ -0,0 +1,87 @@
+"""Saída de /metrics sobre data/dados.xlsx comparada ao cálculo original
+(um groupby por subsistema sobre a planilha lida com pandas), que a versão
+vetorizada precisa reproduzir."""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.services.dataset_service import slugify_cols
+
+
+def _baseline_df(data_file: Path) -> pd.DataFrame:
+    df = pd.read_excel(data_file, header=0)
+    df.columns = slugify_cols(list(df.columns))
+    for col in ["dt_falha", "dt_enc"]:
+        df[col] = pd.to_datetime(df[col], format="%Y-%m-%d", errors="coerce")
+    for col in ["hr_falha", "hr_enc"]:
+        df[col] = df[col].astype(str).str.strip().str.replace(r"\s+", "", regex=True)
+        df[col] = pd.to_datetime(df[col], format="%H:%M", errors="coerce").dt.time
+    df["subsistema"] = df["subsistema"].astype("string")
+    return df
+
+
+def _baseline_mttf(df: pd.DataFrame) -> list:
+    df = df.sort_values(by=["subsistema", "dt_falha", "hr_falha"])
+    results = []
+    for subsistema, group in df.groupby("subsistema"):
+        group = group.dropna(subset=["dt_falha"])
+        if len(group) < 2:
+            continue
+        mttf = (group["dt_falha"].diff().dt.total_seconds() / (3600 * 24)).mean(skipna=True)
+        results.append({"subsistema": subsistema, "mttf_dias": round(mttf, 2)})
+    return sorted(results, key=lambda x: x["mttf_dias"] or 0, reverse=True)
+
+
+def _baseline_mttr(df: pd.DataFrame) -> list:
+    results = []
+    for subsistema, group in df.groupby("subsistema"):
+        group = group.dropna(subset=["dt_falha", "dt_enc"])
+        if len(group) == 0:
+            continue
+        start = pd.to_datetime(group["dt_falha"].astype(str) + " " + group["hr_falha"].astype(str), errors="coerce")
+        end = pd.to_datetime(group["dt_enc"].astype(str) + " " + group["hr_enc"].astype(str), errors="coerce")
+        mttr = ((end - start).dt.total_seconds() / 3600).mean(skipna=True)
+        results.append({"subsistema": subsistema, "mttr_horas": round(mttr, 2) if pd.notnull(mttr) else None})
+    return sorted(results, key=lambda x: x["mttr_horas"] or 0)
+
+
+def _baseline_disponibilidade(df: pd.DataFrame) -> pd.DataFrame:
+    merged = pd.merge(pd.DataFrame(_baseline_mttf(df)), pd.DataFrame(_baseline_mttr(df)), on="subsistema")
+    merged["disponibilidade"] = merged["mttf_dias"] * 24 / (merged["mttf_dias"] * 24 + merged["mttr_horas"]) * 100
+    return merged
+
+
+@pytest.fixture(scope="module")
+def baseline(data_file):
+    return _baseline_df(data_file)
+
+
+def _by_subsystem(rows: list, column: str) -> dict:
+    return {row["subsistema"]: row[column] for row in rows if row[column] is not None}
+
+
+def test_mttf_matches_baseline(client, baseline):
+    expected = _baseline_mttf(baseline)
+    got = client.get("/metrics/mttf").json()
+    assert _by_subsystem(got, "mttf_dias") == _by_subsystem(expected, "mttf_dias")
+    assert [row["mttf_dias"] for row in got] == [row["mttf_dias"] for row in expected]
+
+
+def test_mttr_matches_baseline(client, baseline):
+    expected = _baseline_mttr(baseline)
+    got = client.get("/metrics/mttr").json()
+    # Soma em outra ordem: o arredondamento pode mudar na segunda casa
+    assert _by_subsystem(got, "mttr_horas") == pytest.approx(_by_subsystem(expected, "mttr_horas"), abs=0.01)
+
+
+def test_disponibilidade_matches_baseline(client, baseline):
+    # O cálculo original partia do MTTF e do MTTR já arredondados; o atual
+    # usa os valores exatos, o que muda até 0,02 ponto percentual
+    expected = _baseline_disponibilidade(baseline)
+    got = client.get("/metrics/disponibilidade").json()
+    assert _by_subsystem(got, "disponibilidade") == pytest.approx(
+        dict(zip(expected["subsistema"], expected["disponibilidade"].round(2))), abs=0.021
+    )
+    media = client.get("/metrics/disponibilidade-media").json()["disponibilidade_media"]
+    assert media == round(expected["disponibilidade"].mean(), 2)
@@ -0,0 +1,58 @@
+"""/metrics com janela e recorte: combinar as partições mensais precisa dar
+o mesmo que recalcular do zero só com as linhas selecionadas."""
+import pandas as pd
+import pytest
+
+from app.services.reliability_engine import compute_reliability
+
+# Bordas no meio do mês: exercita o recálculo dos meses parciais
+WINDOW = {"data_inicio": "2019-03-15", "data_fim": "2019-11-20"}
+
+
+def _recompute(snapshot, keep: pd.Series, group_by: str = "subsistema") -> pd.DataFrame:
+    df = snapshot.df[keep]
+    if group_by != "subsistema":
+        df = df.assign(subsistema=df[group_by])
+    table = compute_reliability(df, snapshot.timestamps[keep]).table
+    return table[table["quantidade_falhas"] > 0]
+
+
+def _in_window(snapshot) -> pd.Series:
+    dt_falha = snapshot.df["dt_falha"]
+    return dt_falha.between(pd.Timestamp(WINDOW["data_inicio"]), pd.Timestamp(WINDOW["data_fim"]))
+
+
+def _values(rows: list, group_by: str, column: str) -> dict:
+    return {row[group_by]: row[column] for row in rows}
+
+
+@pytest.mark.parametrize("column, url", [("mttf_dias", "/metrics/mttf"), ("mttr_horas", "/metrics/mttr")])
+def test_window_matches_recompute(client, snapshot, column, url):
+    expected = _recompute(snapshot, _in_window(snapshot))[column].dropna().round(2).to_dict()
+    got = _values(client.get(url, params=WINDOW).json(), "subsistema", column)
+    assert got == pytest.approx(expected, abs=0.01)
+
+
+def test_scope_and_grouping_match_recompute(client, snapshot):
+    keep = _in_window(snapshot) & (snapshot.df["prioridade"] == "Alta")
+    expected = _recompute(snapshot, keep, "local")["disponibilidade"].dropna().round(2).to_dict()
+    params = {**WINDOW, "prioridade": "alta", "agrupar_por": "local"}
+    got = _values(client.get("/metrics/disponibilidade", params=params).json(), "local", "disponibilidade")
+    assert got == pytest.approx(expected, abs=0.01)
+
+
+def test_failure_counts_match_rows_in_scope(client, snapshot):
+    keep = _in_window(snapshot) & (snapshot.df["local"] == "ESTACAO RECIFE")
+    expected = snapshot.df.loc[keep, "subsistema"].value_counts()
+    params = {**WINDOW, "local": "estação recife"}
+    got = client.get("/metrics/falhas", params=params).json()
+    assert _values(got, "subsistema", "quantidade_falhas") == expected[expected > 0].to_dict()
+    assert [row["quantidade_falhas"] for row in got] == sorted(expected[expected > 0], reverse=True)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"ultimos_dias": 10**9}, {"local": "estação inexistente"}, {"prioridade": "urgente"}],
+)
+def test_invalid_filters_return_422(client, params):
+    assert client.get("/metrics/mttf", params=params).status_code == 422
@@ -0,0 +1,66 @@
+"""route_question sobre data/dados.xlsx: perguntas com período, local ou
+prioridade não podem receber o valor do histórico inteiro."""
+from datetime import date
+
+import pytest
+
+from app.services.query_router import route_question
+from app.services.reliability_store import ReliabilityStore
+from app.services.search_filters import SearchFilters
+
+YEAR_2019 = dict(data_inicio=date(2019, 1, 1), data_fim=date(2019, 12, 31))
+
+
+def test_metric_uses_year_from_question(snapshot):
+    full = route_question("Qual o MTTF do SINCDVAFO?", snapshot)
+    routed = route_question("Qual o MTTF do SINCDVAFO em 2019?", snapshot)
+    expected = ReliabilityStore().report(snapshot, SearchFilters(subsistemas=("SINCDVAFO",), **YEAR_2019))
+
+    assert routed.data[0]["mttf_dias"] == round(float(expected.table.loc["SINCDVAFO", "mttf_dias"]), 2)
+    assert routed.data != full.data
+    assert routed.text.startswith("Considerando o período de 01/01/2019 a 31/12/2019")
+
+
+def test_metric_uses_request_filters(snapshot):
+    routed = route_question("Qual o MTTF do SINCDVAFO?", snapshot, SearchFilters(**YEAR_2019))
+    assert routed.data == route_question("Qual o MTTF do SINCDVAFO em 2019?", snapshot).data
+
+
+def test_relative_window_without_records(snapshot):
+    # A planilha de exemplo termina em 2020
+    routed = route_question("Qual o MTTF do SINCDVCAV nos últimos 30 dias?", snapshot)
+    assert routed.intent == "mttf"
+    assert routed.data == []
+    assert routed.text.startswith("Não há falhas registradas")
+
+
+def test_rankings_respect_subsystem_and_local(snapshot):
+    locais = route_question("Quais locais com mais falhas no subsistema SINCDVAFO?", snapshot)
+    assert {row["local"] for row in locais.data} == set(
+        snapshot.df.loc[snapshot.df["subsistema"] == "SINCDVAFO", "local"].astype(str)
+    )
+
+    subsistemas = route_question("Qual subsistema apresenta mais falhas na estação recife?", snapshot)
+    in_recife = snapshot.df.loc[snapshot.df["local"] == "ESTACAO RECIFE", "subsistema"]
+    assert subsistemas.data[0]["subsistema"] == in_recife.value_counts().index[0]
+    assert sum(row["quantidade"] for row in subsistemas.data) <= len(in_recife)
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Qual subsistema apresenta mais falhas em Recife?",
+        "Qual subsistema tem o maior MTTR em março?",
+        "Qual subsistema tem o maior MTTR de alta prioridade?",
+        "Quais reclamações foram registradas sobre o SINCDVAFO?",
+        "O que o reclamante RUBENS relatou sobre a falha no CDV?",
+    ],
+)
+def test_unsupported_scope_goes_to_rag(snapshot, question):
+    assert route_question(question, snapshot) is None
+
+
+def test_reclamante_ranking(snapshot):
+    routed = route_question("Qual é o reclamente que mais registrou falhas?", snapshot)
+    assert routed.intent == "top_reclamantes"
+    assert routed.data[0]["reclamante"] == snapshot.df["reclamante"].value_counts().index[0]